@@ -1,26 +1,38 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Dict, Any
+import asyncio
+import hashlib
+import httpx
+import numpy as np
 import openai
+import orjson
 import os
-import json
 import re
-import csv
-import langfuse
+import string
+import sys
 import logging
-import pandas as pd
-from langchain_community.chat_models import ChatOpenAI
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import HumanMessage, SystemMessage
+import time
+from collections import OrderedDict
+from functools import lru_cache
 from langfuse import get_client, observe, Langfuse
 
 
 from dotenv import load_dotenv
 load_dotenv()
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO, which would be one line per OpenAI call
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+# Full LLM output is only logged when explicitly requested; it can be several KB per request
+DEBUG_LLM_OUTPUT = os.getenv("DEBUG_LLM_OUTPUT") == "1"
 
 # Safe default agent context used when none is provided
 YOUR_DEFAULT_AGENT_CONTEXT = {"agent_answers": []}
@@ -34,87 +46,277 @@ app.add_middleware(
 )
 
 class QuestionAnswer(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     question: str
     answer: str
 
 class Question(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     question: str
     answer: str
     
 class QuestionSection(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     section: str
     questions: list[QuestionAnswer]
 
 class ContentRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     agent_answers: list[QuestionSection]
 
 class Section(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     section: str
     questions: List[Question]
 
 class EmailGenerator(BaseModel):
-    agent_answers: List[Section]
+    model_config = ConfigDict(frozen=True)
 
+    agent_answers: List[Section]
+    # Submit through the OpenAI Batch API and poll GET /generate-email/{batch_id} for results
+    background: bool = False
 
-# === Load DataFrame ===
-import json
 
+# === Load Templates ===
 JSON_INPUT_PATH = r"data/easy_templates_csv_variables.json"
-with open(JSON_INPUT_PATH, "r", encoding="utf-8") as f:
-    data = json.load(f)  # data is a list of dicts with 'stage' and 'content'
-
-# Initialize LangChain's OpenAI wrapper
-llm = ChatOpenAI(
-    openai_api_key=os.getenv("OPENAI_API_KEY"),  # Use environment variable instead
-    model="gpt-4o-mini",
-    temperature=0.7,
-    max_tokens=1500
+
+@lru_cache(maxsize=1)
+def get_email_templates():
+    """Email templates, read on first use and trimmed to the fields /generate-email uses"""
+    with open(JSON_INPUT_PATH, "rb") as f:
+        rows = orjson.loads(f.read())
+    return tuple({"stage": row["stage"], "template": row["template"]} for row in rows)
+
+# Room for several concurrent /generate-email fan-outs, while only a warm core of
+# connections is kept alive between bursts
+OPENAI_POOL_LIMITS = httpx.Limits(
+    max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", "128")),
+    max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", "64")),
+)
+
+# One HTTP/2 connection pool shared by every OpenAI call, so concurrent requests
+# multiplex over warm connections instead of each paying a TLS handshake
+http_client = httpx.AsyncClient(
+    http2=True,
+    timeout=60.0,
+    limits=OPENAI_POOL_LIMITS,
+)
+
+# Transient 429/5xx/connection errors are retried with the SDK's exponential backoff
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+
+# Shared async OpenAI client
+openai_client = openai.AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=http_client,
+    max_retries=OPENAI_MAX_RETRIES,
+)
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await http_client.aclose()
+
+
+async def stream_completion_text(**kwargs):
+    """Yield the text deltas of a streamed chat completion"""
+    stream = await openai_client.chat.completions.create(stream=True, **kwargs)
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+class ResponseCache:
+    """In-process LRU cache with a per-entry time-to-live."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+def prompt_cache_key(*parts):
+    """SHA-256 over the prompt parts with line endings and trailing whitespace normalized"""
+    canonical = "\x00".join(
+        "\n".join(line.rstrip() for line in part.replace("\r\n", "\n").split("\n"))
+        for part in parts
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# Finished /generate-content responses keyed by prompt; a hit skips generation and scoring
+content_cache = ResponseCache(
+    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+    ttl=int(os.getenv("RESPONSE_CACHE_TTL", "86400")),
 )
 
+def summarize_agent_answers(agent_answers):
+    """Lightweight trace input: section names and question count instead of the full payload"""
+    return {
+        "sections": [section.section for section in agent_answers],
+        "num_questions": sum(len(section.questions) for section in agent_answers),
+    }
+
 @observe(name="build_agent_prompt")
 def build_agent_prompt(agent_answers):
-    """Build the complete prompt from agent answers"""
-    prompt = prompt_template
+    """Build the agent-specific part of the prompt; the template is sent separately as the system message"""
+    parts = []
     for section in agent_answers:
-        prompt += f"\n## {section.section}\n"
+        parts.append(f"\n## {section.section}\n")
         for qa in section.questions:
-            prompt += f"- {qa.question}\n{qa.answer}\n"
+            parts.append(f"- {qa.question}\n{qa.answer}\n")
     
-    return prompt
+    return "".join(parts)
+
+# Template fields that change from one email template to the next
+EMAIL_ROW_FIELDS = ("original_html", "stage")
+
+@lru_cache(maxsize=8)
+def split_email_template(prompt_template):
+    """Split the email template before its first per-template field into (prefix, suffix) format strings"""
+    prefix = []
+    suffix = []
+    for literal, field, spec, conversion in string.Formatter().parse(prompt_template):
+        target = suffix if suffix else prefix
+        literal = literal.replace("{", "{{").replace("}", "}}")
+        if field is None:
+            target.append(literal)
+            continue
+        if field.split(".")[0].split("[")[0] in EMAIL_ROW_FIELDS:
+            target.append(literal)
+            target = suffix
+            literal = ""
+        target.append(literal + "{" + field + ("!" + conversion if conversion else "") + (":" + spec if spec else "") + "}")
+    return "".join(prefix), "".join(suffix)
+
+def render_agent_context(agent_context):
+    """Serialize the agent context once, with sorted keys so the prompt prefix is byte-stable"""
+    return orjson.dumps(agent_context, option=orjson.OPT_SORT_KEYS).decode()
 
 def build_prompt(original_html, stage, agent_context=None):
-    print(f"[build_prompt] Building prompt for stage: {stage}")
-    print(f"[build_prompt] Original HTML length: {len(original_html)} characters")
-    print(f"[build_prompt] Agent context provided: {agent_context is not None}")
+    """Render the email prompt as chat messages: the part of the template before the first
+    per-template field becomes the system message, so it is identical for every template of an agent"""
+    logger.debug("build_prompt stage=%s html_length=%d agent_context=%s", stage, len(original_html), agent_context is not None)
     
     if agent_context is None:
-        print("[build_prompt] WARNING: Using default agent context (fallback)")
-        agent_context = YOUR_DEFAULT_AGENT_CONTEXT  # fallback
+        logger.warning("build_prompt: using default agent context (fallback)")
+        agent_context = render_agent_context(YOUR_DEFAULT_AGENT_CONTEXT)  # fallback
 
     try:
-        # Fetch prompt template from Langfuse
-        print("[build_prompt] Fetching prompt template from Langfuse")
-        prompt_obj = langfuse_client.get_prompt("personalize_email_prompt", label="production")
-        prompt_template = prompt_obj.prompt  # or .content, depending on SDK version
-        print(f"[build_prompt] Successfully fetched prompt template, length: {len(prompt_template)}")
+        # Cached Langfuse prompt template, refreshed in the background
+        prefix_template, suffix_template = split_email_template(get_prompt_template(EMAIL_PROMPT_NAME))
 
         # Render the prompt with variables
-        print("[build_prompt] Rendering prompt with variables")
-        rendered_prompt = prompt_template.format(
-            original_html=original_html,
-            stage=stage,
-            agent_context=agent_context
-        )
-        print(f"[build_prompt] Successfully rendered prompt, final length: {len(rendered_prompt)}")
-        return rendered_prompt
+        variables = {"original_html": original_html, "stage": stage, "agent_context": agent_context}
+        system_prompt = prefix_template.format(**variables)
+        user_prompt = suffix_template.format(**variables)
+        if system_prompt.strip() and user_prompt.strip():
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ]
+        else:
+            messages = [{"role": "user", "content": system_prompt + user_prompt}]
+        logger.debug("build_prompt rendered length=%d", sum(len(message["content"]) for message in messages))
+        return messages
     except Exception as e:
-        print(f"[build_prompt] ERROR building prompt for stage {stage}: {str(e)}")
+        logger.error("build_prompt failed for stage %s: %s", stage, e)
         raise
 
+def email_prefix_cache_key(messages):
+    """OpenAI prompt_cache_key shared by every email call with the same system prefix"""
+    return "generate_email:" + hashlib.sha256(messages[0]["content"].encode("utf-8")).hexdigest()[:16]
+
+# The personalized email is a rewrite of the source HTML, so its length tracks the input;
+# capping output near that size stops a runaway completion without truncating real ones
+EMAIL_MAX_TOKENS_CAP = int(os.getenv("EMAIL_MAX_TOKENS_CAP", "16384"))
+
+def email_max_tokens(html):
+    """Output token budget for personalizing one email template (~2 chars per token plus headroom)"""
+    return min(len(html) // 2 + 512, EMAIL_MAX_TOKENS_CAP)
+
 # Initialize Langfuse
 langfuse = get_client()
-prompt_obj = langfuse.get_prompt("real_estate_content_generation", label="production")
-prompt_template = prompt_obj.prompt  # or .content, depending on SDK version
+
+# Langfuse prompt templates are cached in-process and refreshed in the background,
+# so the request path normally only reads a cached string
+CONTENT_PROMPT_NAME = "real_estate_content_generation"
+EMAIL_PROMPT_NAME = "personalize_email_prompt"
+PROMPT_REFRESH_INTERVAL = int(os.getenv("PROMPT_REFRESH_INTERVAL", "300"))
+_prompt_templates = {}
+
+def get_prompt_template(name, label="production"):
+    """Return the cached Langfuse prompt template, fetching it on first use"""
+    key = (name, label)
+    template = _prompt_templates.get(key)
+    if template is None:
+        template = langfuse.get_prompt(name, label=label).prompt  # or .content, depending on SDK version
+        _prompt_templates[key] = template
+    return template
+
+# Templates the endpoints need; the refresh loop keeps retrying these even if the first fetch failed
+REQUIRED_PROMPTS = ((CONTENT_PROMPT_NAME, "production"), (EMAIL_PROMPT_NAME, "production"))
+
+async def require_prompt_template(name, label="production"):
+    """Template for a request handler: a cache miss is fetched off the event loop, and if
+    Langfuse can't provide it the request fails fast with a 503"""
+    template = _prompt_templates.get((name, label))
+    if template is not None:
+        return template
+    try:
+        return await asyncio.to_thread(get_prompt_template, name, label)
+    except Exception as e:
+        logger.error("Fetching prompt %s failed: %s", name, e)
+        raise HTTPException(status_code=503, detail=f"Prompt template '{name}' is unavailable, try again shortly")
+
+def refresh_prompt_templates():
+    """Re-fetch every cached template plus any required one still missing, keeping the
+    previous copy if Langfuse is unreachable"""
+    for name, label in dict.fromkeys((*_prompt_templates, *REQUIRED_PROMPTS)):
+        try:
+            _prompt_templates[(name, label)] = langfuse.get_prompt(name, label=label, cache_ttl_seconds=0).prompt
+        except Exception as e:
+            logger.error("Refreshing prompt %s failed: %s", name, e)
+
+def warm_prompt_templates():
+    """Fetch the templates the endpoints use so the first requests don't wait on Langfuse"""
+    for name in (CONTENT_PROMPT_NAME, EMAIL_PROMPT_NAME):
+        try:
+            get_prompt_template(name)
+        except Exception as e:
+            logger.error("Warming prompt %s failed: %s", name, e)
+
+async def refresh_prompt_templates_periodically():
+    await asyncio.to_thread(warm_prompt_templates)
+    while True:
+        await asyncio.sleep(PROMPT_REFRESH_INTERVAL)
+        await asyncio.to_thread(refresh_prompt_templates)
+
+@app.on_event("startup")
+async def start_prompt_refresh():
+    # Warming runs in the background task, so startup does not block on Langfuse
+    app.state.prompt_refresh_task = asyncio.create_task(refresh_prompt_templates_periodically())
 
 langfuse_client = Langfuse(
     public_key=os.environ.get("LANGFUSE_PUBLIC_KEY"),
@@ -122,16 +324,30 @@ langfuse_client = Langfuse(
     host=os.environ.get("LANGFUSE_HOST", "https://cloud.langfuse.com")
 )
 
+@app.on_event("shutdown")
+async def flush_langfuse():
+    """Ship any buffered traces before the process exits"""
+    langfuse.flush()
+    langfuse_client.flush()
+
+# Patterns used by clean_json, compiled once at import
+_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*(.*?)\s*(?:```|$)', re.DOTALL)
+_CTRL_RE = re.compile(r'\\[0-9]+,?')
+_TRAILING_COMMA_RE = re.compile(r',([ \t\r\n]*[}\]])')
+
 @observe(name="clean_json")
 def clean_json(text):
     """Clean and format JSON response"""
-    # Remove code fences
-    if text.strip().startswith('```'):
-        text = text.split('```')[1]
+    # Remove code fences (and a leading "json" language tag)
+    fenced = _FENCE_RE.match(text)
+    if fenced:
+        text = fenced.group(1)
     # Remove any stray control characters (like \1)
-    text = re.sub(r'\\[0-9]+,?', '', text)
+    if '\\' in text:
+        text = _CTRL_RE.sub('', text)
     # Remove trailing commas before } or ]
-    text = re.sub(r',([ \t\r\n]*[}\]])', r'\1', text)
+    if ',' in text:
+        text = _TRAILING_COMMA_RE.sub(r'\1', text)
     
     cleaned_text = text.strip()
     # Try to add a closing brace if missing
@@ -139,502 +355,840 @@ def clean_json(text):
         cleaned_text += '}'
     return cleaned_text
 
+# Top-level sections of the generated content that get an LLM-as-a-judge score
+SCORED_SECTIONS = (
+    "home_page",
+    "three_steps_carousel",
+    "about_us_page",
+    "contact_us_page",
+    "global_settings",
+    "call_to_action",
+)
+
+# With SCORING_PREFILTER=1, sections that pass cheap structural checks skip the LLM judge
+SCORING_PREFILTER = os.getenv("SCORING_PREFILTER") == "1"
+_PLACEHOLDER_RE = re.compile(
+    r'\b(?:todo|tbd|lorem ipsum|placeholder)\b|\[(?:your|insert|agent)[^\]]*\]|\{\{[^}]*\}\}',
+    re.IGNORECASE,
+)
+
+def section_passes_prefilter(section_content):
+    """True if the section is a non-empty structure whose strings are all filled in"""
+    if not isinstance(section_content, (dict, list)):
+        return False
+    stack = [section_content]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if not value:
+                return False
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            if not value:
+                return False
+            stack.extend(value)
+        elif isinstance(value, str):
+            if not value.strip() or _PLACEHOLDER_RE.search(value):
+                return False
+        elif value is None:
+            return False
+    return True
+
+# JSON mode requires "JSON" to appear in the messages; it goes after the agent answers
+# so the template prefix stays byte-identical
+CONTENT_JSON_INSTRUCTION = "\n\nRespond with a single JSON object."
+
+# With INLINE_SCORING=1 the generation call also grades its own sections, saving the
+# separate judge round trip; sections it leaves unscored still go to the judge
+INLINE_SCORING = os.getenv("INLINE_SCORING") == "1"
+INLINE_SCORING_INSTRUCTION = (
+    "\n\nRespond with a single JSON object of the form "
+    '{"content": {...}, "scores": {...}}. '
+    "Put the generated website content under \"content\". After producing it, evaluate each of "
+    "these sections for quality, completeness, and clarity: " + ", ".join(SCORED_SECTIONS) + ". "
+    "Under \"scores\", give each one as {\"<section_name>\": {\"score\": float, \"reason\": string}} "
+    "with a score from 0.0 to 1.0 and a short reason."
+)
+
+def content_completion_kwargs(prompt_template, prompt):
+    """Chat completion arguments for a /generate-content generation"""
+    return dict(
+        model="gpt-4o-mini",
+        temperature=0.7,
+        max_tokens=2200 if INLINE_SCORING else 1500,
+        # Static template first so OpenAI's prefix cache can reuse it across agents
+        messages=[
+            {"role": "system", "content": prompt_template},
+            {"role": "user", "content": prompt + (INLINE_SCORING_INSTRUCTION if INLINE_SCORING else CONTENT_JSON_INSTRUCTION)},
+        ],
+        response_format={"type": "json_object"},
+        extra_body={"prompt_cache_key": "real_estate_v1"},
+    )
+
+def split_generated_content(result):
+    """Unwrap an INLINE_SCORING reply into (content, inline_scores)"""
+    if INLINE_SCORING and isinstance(result.get("content"), dict):
+        inline_scores = result.get("scores")
+        return result["content"], inline_scores if isinstance(inline_scores, dict) else {}
+    return result, {}
+
+async def score_generated_content(result, inline_scores):
+    """Score each generated section: inline self-scores first, then the structural prefilter, then the batched judge"""
+    section_scores = {}
+    pending_sections = {}
+    for section in SCORED_SECTIONS:
+        if section not in result:
+            continue
+        evaluation = inline_scores.get(section)
+        if isinstance(evaluation, dict) and "score" in evaluation:
+            section_scores[section] = (evaluation["score"], evaluation.get("reason", "No reason provided"))
+        elif SCORING_PREFILTER and section_passes_prefilter(result[section]):
+            section_scores[section] = (1.0, "Passed structural checks; LLM judge skipped")
+        else:
+            pending_sections[section] = result[section]
+    if pending_sections:
+        section_scores.update(await score_sections_with_llm(pending_sections))
+
+    scores = {}
+    for section in SCORED_SECTIONS:
+        if section in section_scores:
+            score, reason = section_scores[section]
+            scores[section] = {"score": score, "reason": reason}
+    return scores
+
 @observe
 @app.post("/generate-content")
-def generate_content(request: ContentRequest):
+async def generate_content(request: ContentRequest, background_tasks: BackgroundTasks):
     """Generate real estate content using LLM"""
+    prompt_template = await require_prompt_template(CONTENT_PROMPT_NAME)
     with langfuse.start_as_current_span(
         name="llm_generation",
-        input={"request": request.dict()},
+        input={"request": summarize_agent_answers(request.agent_answers)},
         metadata={"model": "gpt-4o-mini"}
     ) as span:
-        print("request.agent_answers-->",request.agent_answers)
+        logger.debug("generate-content request with %d sections", len(request.agent_answers))
         # Build the prompt
         prompt = build_agent_prompt(request.agent_answers)
+
+        cache_key = prompt_cache_key(prompt_template, prompt)
+        cached = content_cache.get(cache_key)
+        if cached is not None:
+            span.update(metadata={"cache_hit": True})
+            return cached
         
-        # Use LangChain to call the LLM
-        messages = [
-            SystemMessage(content="You are a helpful assistant."),
-            HumanMessage(content=prompt)
-        ]
-        
-        response = llm(messages)
-        content = response.content
+        # Call the LLM, streaming so the time to first token is visible in the trace
+        started = time.monotonic()
+        time_to_first_token = None
+        chunks = []
+        async for text in stream_completion_text(**content_completion_kwargs(prompt_template, prompt)):
+            if time_to_first_token is None:
+                time_to_first_token = time.monotonic() - started
+            chunks.append(text)
+        content = "".join(chunks)
         
         span.update(
             output={"raw_response": content[:500] + "..." if len(content) > 500 else content},
-            metadata={"response_length": len(content)}
+            metadata={"response_length": len(content), "time_to_first_token": time_to_first_token}
         )
         
-        # Clean and parse JSON
-        cleaned_content = clean_json(content)
-        print("LLM Output:\n", cleaned_content)
-        result = json.loads(cleaned_content)
+        # JSON mode guarantees a well-formed object, so no clean-up pass is needed
+        logger.debug("LLM output length=%d", len(content))
+        if DEBUG_LLM_OUTPUT:
+            logger.info("LLM output:\n%s", content)
+        result, inline_scores = split_generated_content(orjson.loads(content))
         
         span.update(
-            output={"parsed_successfully": True, "result_keys": list(result.keys())},
-            metadata={"cleaned_content_length": len(cleaned_content)}
+            output={"parsed_successfully": True, "result_keys": list(result.keys())}
         )
         
-        # Score the generation (optional - you can customize this)
-        span.score(name="correctness", value=1.0, comment="Content generated successfully")
+        # Score the generation (optional - you can customize this); scores are recorded
+        # after the response is sent
+        background_tasks.add_task(span.score, name="correctness", value=1.0, comment="Content generated successfully")
         
-        section_scoring_functions = {
-            "home_page": score_home_page,
-            "three_steps_carousel": score_three_steps_carousel,
-            "about_us_page": score_about_us_page,
-            "contact_us_page": score_contact_us_page,
-            "global_settings": score_global_settings,
-            "call_to_action": score_call_to_action,
-        }
-
-        scores = {}
-        for section, scoring_func in section_scoring_functions.items():
-            if section in result:
-                score, reason = scoring_func(llm, result[section])
-                scores[section] = {"score": score, "reason": reason}
-                span.score(name=section, value=score, comment=reason)
+        scores = await score_generated_content(result, inline_scores)
+        for section, evaluation in scores.items():
+            background_tasks.add_task(span.score, name=section, value=evaluation["score"], comment=evaluation["reason"])
         
-        langfuse.flush()
+        # The SDK exports in the background; only flush when explicitly requested. Background
+        # tasks run in order, so queuing the flush last makes it cover the scores above
+        if os.getenv("LANGFUSE_ENFORCE_FLUSH") == "1":
+            background_tasks.add_task(langfuse.flush)
         
-        return {
+        payload = {
             "status": "ok",
             "result": "success",
             "data": result,
             "scores": scores
         }
+        content_cache.set(cache_key, payload)
+        return payload
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+@app.post("/generate-content/stream")
+async def generate_content_stream(request: ContentRequest):
+    """Same generation as /generate-content, as Server-Sent Events: "delta" events carry the model
+    text as it is produced, then one "result" event carries the /generate-content payload"""
+    logger.debug("generate-content stream request with %d sections", len(request.agent_answers))
+    prompt_template = await require_prompt_template(CONTENT_PROMPT_NAME)
+    prompt = build_agent_prompt(request.agent_answers)
+    cache_key = prompt_cache_key(prompt_template, prompt)
+
+    async def events():
+        cached = content_cache.get(cache_key)
+        if cached is not None:
+            yield sse_event("result", cached)
+            return
+        span = langfuse.start_span(
+            name="llm_generation_stream",
+            input={"request": summarize_agent_answers(request.agent_answers)},
+            metadata={"model": "gpt-4o-mini"},
+        )
+        try:
+            chunks = []
+            async for text in stream_completion_text(**content_completion_kwargs(prompt_template, prompt)):
+                chunks.append(text)
+                yield sse_event("delta", {"text": text})
+            result, inline_scores = split_generated_content(orjson.loads("".join(chunks)))
+            scores = await score_generated_content(result, inline_scores)
+            payload = {
+                "status": "ok",
+                "result": "success",
+                "data": result,
+                "scores": scores
+            }
+            content_cache.set(cache_key, payload)
+            span.update(output={"parsed_successfully": True, "result_keys": list(result.keys())})
+            for section, evaluation in scores.items():
+                span.score(name=section, value=evaluation["score"], comment=evaluation["reason"])
+            yield sse_event("result", payload)
+        except Exception as e:
+            logger.exception("generate-content stream failed")
+            span.update(output=str(e), level="ERROR")
+            yield sse_event("error", {"detail": str(e)})
+        finally:
+            span.end()
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+# Upper bound on concurrent OpenAI calls across all /generate-email requests in this worker.
+# The limiter below is per worker too, so with WEB_CONCURRENCY workers up to
+# EMAIL_CONCURRENCY * WEB_CONCURRENCY calls can be in flight against the shared OpenAI limits
+EMAIL_CONCURRENCY = int(os.getenv("EMAIL_CONCURRENCY", "16"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# 429s that survive the SDK's own retries are retried this many more times, after the
+# limiter has paused every caller until the rate limit window resets
+EMAIL_RATE_LIMIT_RETRIES = int(os.getenv("EMAIL_RATE_LIMIT_RETRIES", "3"))
+
+_RESET_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_RESET_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_ratelimit_reset(value):
+    """Seconds until an OpenAI x-ratelimit-reset-* header value such as "6m0s" or "120ms" elapses"""
+    return sum(float(amount) * _RESET_UNITS[unit] for amount, unit in _RESET_PART_RE.findall(value or ""))
+
+class OpenAIRateLimiter:
+    """Bounds in-flight OpenAI calls and holds new ones back once the request or token
+    budget reported in the x-ratelimit-* response headers runs low"""
+
+    def __init__(self, max_concurrency, min_requests, min_tokens):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.floors = {"requests": min_requests, "tokens": min_tokens}
+        self.resume_at = 0.0
+
+    def pause(self, seconds):
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def update(self, headers):
+        for kind, floor in self.floors.items():
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is not None and int(remaining) < floor:
+                self.pause(parse_ratelimit_reset(headers.get(f"x-ratelimit-reset-{kind}")))
+
+    async def create(self, resource, **kwargs):
+        """Call resource.with_raw_response.create(**kwargs) within the limits and return the parsed response"""
+        for attempt in range(EMAIL_RATE_LIMIT_RETRIES + 1):
+            async with self.semaphore:
+                delay = self.resume_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                try:
+                    raw = await resource.with_raw_response.create(**kwargs)
+                except openai.RateLimitError as e:
+                    if attempt == EMAIL_RATE_LIMIT_RETRIES:
+                        raise
+                    logger.warning("OpenAI rate limit hit, retry %d/%d", attempt + 1, EMAIL_RATE_LIMIT_RETRIES)
+                    self.update(e.response.headers)
+                    self.pause(min(2 ** attempt, 30))
+                    continue
+            self.update(raw.headers)
+            return raw.parse()
+
+# The x-ratelimit-* headers report the org-wide budget, so the floors leave room for the
+# calls every worker may have in flight, not just this one's
+email_rate_limiter = OpenAIRateLimiter(
+    max_concurrency=EMAIL_CONCURRENCY,
+    min_requests=int(os.getenv("EMAIL_RATE_LIMIT_MIN_REQUESTS", str(EMAIL_CONCURRENCY * WEB_CONCURRENCY))),
+    min_tokens=int(os.getenv("EMAIL_RATE_LIMIT_MIN_TOKENS", str(20000 * WEB_CONCURRENCY))),
+)
+
+# Personalized emails keyed by the exact rendered prompt; the same agent resubmitting
+# the same answers gets its emails back without another OpenAI call
+email_cache = ResponseCache(
+    maxsize=int(os.getenv("EMAIL_CACHE_SIZE", "2048")),
+    ttl=int(os.getenv("RESPONSE_CACHE_TTL", "86400")),
+)
 
 @app.post("/generate-email")
 async def post_agent_questionnaire(agent_questionnaire: EmailGenerator):
-    print("[generate-email] Starting email generation process")
-    print(f"[generate-email] Agent questionnaire sections count: {len(agent_questionnaire.agent_answers)}")
-    
-    custom_agent_context = agent_questionnaire.dict()
-    personalized_emails = []
+    custom_agent_context = render_agent_context(agent_questionnaire.model_dump(exclude={"background"}))
+    data = get_email_templates()
+    # build_prompt reads the email template from the cache, so make sure it is loaded first
+    await require_prompt_template(EMAIL_PROMPT_NAME)
+
+    logger.debug("generate-email request with %d sections, %d templates", len(agent_questionnaire.agent_answers), len(data))
 
-    print(f"[generate-email] Total email templates to process: {len(data)}")
+    if agent_questionnaire.background:
+        batch = await submit_email_batch(data, custom_agent_context)
+        return ORJSONResponse(status_code=202, content={"batch_id": batch.id, "status": batch.status})
 
     # Start a single Langfuse span for the batch (or do one per row if you prefer)
     span = langfuse_client.start_span(
         name="agent_questionnaire_batch",
-        input={"questionnaire": custom_agent_context}
+        input={"questionnaire": summarize_agent_answers(agent_questionnaire.agent_answers)}
     )
+    async def personalize_template(sample_html, stage):
+        messages = build_prompt(sample_html, stage, agent_context=custom_agent_context)
+        cache_key = prompt_cache_key(*(message["content"] for message in messages))
+        output = email_cache.get(cache_key)
+        if output is None:
+            response = await email_rate_limiter.create(
+                openai_client.chat.completions,
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.1,
+                max_tokens=email_max_tokens(sample_html),
+                extra_body={"prompt_cache_key": email_prefix_cache_key(messages)},
+            )
+            output = response.choices[0].message.content.strip()
+            email_cache.set(cache_key, output)
+        return output
+
     try:
+        # Rows with the same template and stage get the same email, so each pair is generated once;
+        # empty templates are never sent
+        unique_rows = list(dict.fromkeys(
+            (row['template'], row['stage']) for row in data if row['template'].strip()
+        ))
+        outputs = await asyncio.gather(
+            *(personalize_template(sample_html, stage) for sample_html, stage in unique_rows),
+            return_exceptions=True,
+        )
+        outputs = dict(zip(unique_rows, outputs))
+
+        personalized_emails = []
         for idx, row in enumerate(data):
-            sample_html = row['template']
             stage = row['stage']
-            print(f"[generate-email] Processing template {idx + 1}/{len(data)} - Stage: {stage}")
-            print(f"[generate-email] Template length: {len(sample_html)} characters")
-            
-            prompt = build_prompt(sample_html, stage, agent_context=custom_agent_context)
-            print(f"[generate-email] Built prompt length: {len(prompt)} characters for stage: {stage}")
-            
-            try:
-                print(f"[generate-email] Calling OpenAI API for stage: {stage}")
-                client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-                response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.1
-                )
-                output = response.choices[0].message.content.strip()
-                print(f"[generate-email] Successfully generated email for stage: {stage}, output length: {len(output)}")
-                
-                personalized_emails.append({
-                    "row": idx,
-                    "stage": stage,
-                    "personalized_email": output
-                })
-            except Exception as e:
-                print(f"[generate-email] ERROR generating email for stage {stage}: {str(e)}")
-                personalized_emails.append({
-                    "row": idx,
-                    "stage": stage,
-                    "error": str(e)
-                })
-        
-        print(f"[generate-email] Completed processing all templates. Success count: {len([e for e in personalized_emails if 'error' not in e])}")
-        print(f"[generate-email] Error count: {len([e for e in personalized_emails if 'error' in e])}")
+            if not row['template'].strip():
+                personalized_emails.append({"row": idx, "stage": stage, "skipped": True})
+                continue
+            output = outputs[(row['template'], stage)]
+            if isinstance(output, BaseException):
+                logger.error("generate-email failed for stage %s: %s", stage, output)
+                personalized_emails.append({"row": idx, "stage": stage, "error": str(output)})
+            else:
+                logger.debug("generate-email row=%d stage=%s output_length=%d", idx, stage, len(output))
+                personalized_emails.append({"row": idx, "stage": stage, "personalized_email": output})
         
-        span.update(output=personalized_emails)
-        return JSONResponse(content={"personalized_emails": personalized_emails})
+        # One summary update instead of shipping every generated email to Langfuse
+        span.update(output={
+            "generated": sum(1 for email in personalized_emails if "personalized_email" in email),
+            "skipped": sum(1 for email in personalized_emails if email.get("skipped")),
+            "errors": [email for email in personalized_emails if "error" in email],
+        })
+        return {"personalized_emails": personalized_emails}
     except Exception as e:
-        print(f"[generate-email] FATAL ERROR in email generation: {str(e)}")
+        logger.exception("generate-email failed")
         span.update(output=str(e), level="ERROR")
         raise
     finally:
         span.end()
-        print("[generate-email] Email generation process completed")
 
-# === Call OpenAI ===
-def personalize_content(html, stage):
-    print(f"[personalize_content] Starting personalization for stage: {stage}")
-    print(f"[personalize_content] Input HTML length: {len(html)} characters")
-    
-    prompt = build_prompt(html, stage)
-    print(f"[personalize_content] Built prompt for personalization, length: {len(prompt)}")
-    
-    span = langfuse_client.start_span(name="personalize_email", input=prompt)
-    try:
-        print(f"[personalize_content] Calling OpenAI API for personalization - stage: {stage}")
-        client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1
-        )
-        output = response.choices[0].message.content.strip()
-        print(f"[personalize_content] Successfully personalized content for stage {stage}, output length: {len(output)}")
-        
-        span.update(output=output)
-        return output
-    except Exception as e:
-        print(f"[personalize_content] ERROR personalizing content for stage {stage}: {str(e)}")
-        span.update(output=str(e), level="ERROR")
-        print(f"⚠️ LLM Error: {e}")
-        return html  # fallback to original
-    finally:
-        span.end()
+# Batches this service created carry this tag, so the poll endpoint never serves other batches in the org
+EMAIL_BATCH_SOURCE = "generate_email"
+
+# Batch states whose output/error files hold results; expired and cancelled batches keep partial output
+EMAIL_BATCH_RESULT_STATES = ("completed", "expired", "cancelled")
+
+async def submit_email_batch(templates, agent_context):
+    """Upload one chat completion per template to the OpenAI Batch API (half price, 24h window)"""
+    lines = []
+    for idx, row in enumerate(templates):
+        if not row['template'].strip():
+            continue
+        messages = build_prompt(row['template'], row['stage'], agent_context=agent_context)
+        lines.append(orjson.dumps({
+            "custom_id": str(idx),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": "gpt-4o-mini",
+                "messages": messages,
+                "temperature": 0.1,
+                "max_tokens": email_max_tokens(row['template']),
+                "prompt_cache_key": email_prefix_cache_key(messages),
+            },
+        }))
+    batch_file = await openai_client.files.create(
+        file=("generate_email.jsonl", b"\n".join(lines)),
+        purpose="batch",
+    )
+    batch = await openai_client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+        metadata={"source": EMAIL_BATCH_SOURCE},
+    )
+    logger.info("generate-email batch %s submitted with %d templates", batch.id, len(lines))
+    return batch
 
-# === Apply Personalization ===
-def personalize_row(row):
+@app.get("/generate-email/{batch_id}")
+async def get_email_batch(batch_id: str):
+    """Poll a background /generate-email batch; returns the emails once it has finished
+    (partial results for expired or cancelled batches)"""
     try:
-        original_html = row.get('template', '')
-        stage = row.get('Stage')  # Default to 'Unknown' if not present
-        if not isinstance(original_html, str) or not original_html.strip():
-            raise ValueError("Empty template")
-        personalized_html = personalize_content(original_html, stage)
-        return personalized_html
-    except Exception as e:
-        print(f"skipped row: {e}")
-        return row['template']  # fallback to original content
-    
-def score_home_page(llm, content):
-    return score_section_with_llm(llm, "home_page", content)
+        batch = await openai_client.batches.retrieve(batch_id)
+    except openai.NotFoundError:
+        raise HTTPException(status_code=404, detail="Unknown batch")
+    if (batch.metadata or {}).get("source") != EMAIL_BATCH_SOURCE:
+        raise HTTPException(status_code=404, detail="Unknown batch")
+    if batch.status not in EMAIL_BATCH_RESULT_STATES:
+        return {"batch_id": batch.id, "status": batch.status}
+
+    data = get_email_templates()
+    personalized_emails = [
+        {"row": idx, "stage": row["stage"], "skipped": True}
+        for idx, row in enumerate(data) if not row["template"].strip()
+    ]
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = await openai_client.files.content(file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            item = orjson.loads(line)
+            idx = int(item["custom_id"])
+            response = item.get("response") or {}
+            email = {"row": idx, "stage": data[idx]["stage"] if idx < len(data) else None}
+            if response.get("status_code") == 200:
+                email["personalized_email"] = response["body"]["choices"][0]["message"]["content"].strip()
+            else:
+                error = item.get("error") or (response.get("body") or {}).get("error") or {}
+                email["error"] = error.get("message", "Batch request failed")
+            personalized_emails.append(email)
+    personalized_emails.sort(key=lambda email: email["row"])
+    return {"batch_id": batch.id, "status": batch.status, "personalized_emails": personalized_emails}
 
-def score_three_steps_carousel(llm, content):
-    return score_section_with_llm(llm, "three_steps_carousel", content)
+SCORING_SYSTEM_PROMPT = """Evaluate each of the following website sections for quality, completeness, and clarity. Give each section a score from 0.0 to 1.0 and a short reason.
 
-def score_about_us_page(llm, content):
-    return score_section_with_llm(llm, "about_us_page", content)
+Respond with a JSON object keyed by section name in this format:
+{"<section_name>": {"score": float, "reason": string}}"""
 
-def score_contact_us_page(llm, content):
-    return score_section_with_llm(llm, "contact_us_page", content)
+# A score plus a one-line reason fits comfortably in this many output tokens per section
+SCORING_MAX_TOKENS_PER_SECTION = 80
 
-def score_global_settings(llm, content):
-    return score_section_with_llm(llm, "global_settings", content)
+# Judge verdicts keyed by section name + content hash, so unchanged boilerplate sections
+# are not re-scored across requests
+section_score_cache = ResponseCache(
+    maxsize=1024,
+    ttl=int(os.getenv("RESPONSE_CACHE_TTL", "86400")),
+)
 
-def score_call_to_action(llm, content):
-    return score_section_with_llm(llm, "call_to_action", content)
+def section_score_key(section_name, section_content):
+    content = orjson.dumps(section_content, option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(section_name.encode("utf-8") + b"\x00" + content, digest_size=16).hexdigest()
 
-def score_section_with_llm(llm, section_name, section_content):
-    eval_prompt = f"""Evaluate the following section for quality, completeness, and clarity. Give a score from 0.0 to 1.0 and a short reason.
+@lru_cache(maxsize=64)
+def scoring_response_format(section_names):
+    """Strict structured-output schema: exactly one {score, reason} verdict per requested section"""
+    verdict = {
+        "type": "object",
+        "properties": {"score": {"type": "number"}, "reason": {"type": "string"}},
+        "required": ["score", "reason"],
+        "additionalProperties": False,
+    }
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "section_scores",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {section_name: verdict for section_name in section_names},
+                "required": list(section_names),
+                "additionalProperties": False,
+            },
+        },
+    }
 
-Section ("{section_name}"):
-{json.dumps(section_content, indent=2)}
+async def score_sections_with_llm(sections):
+    """Score sections in a single LLM call, reusing cached verdicts; returns {section_name: (score, reason)}"""
+    scores = {}
+    pending = {}
+    for section_name, section_content in sections.items():
+        key = section_score_key(section_name, section_content)
+        cached = section_score_cache.get(key)
+        if cached is not None:
+            scores[section_name] = cached
+        else:
+            pending[section_name] = (key, section_content)
+    if not pending:
+        return scores
 
-Respond in this JSON format:
-{{"score": float, "reason": string}}"""
-    eval_result = llm([HumanMessage(content=eval_prompt)])
+    eval_prompt = "\n\n".join(
+        f"""Section ("{section_name}"):
+{orjson.dumps(section_content).decode()}"""
+        for section_name, (_, section_content) in pending.items()
+    )
+    eval_result = await openai_client.chat.completions.create(
+        model="gpt-4o-mini",
+        temperature=0.0,
+        max_tokens=SCORING_MAX_TOKENS_PER_SECTION * len(pending),
+        messages=[
+            {"role": "system", "content": SCORING_SYSTEM_PROMPT},
+            {"role": "user", "content": eval_prompt},
+        ],
+        response_format=scoring_response_format(tuple(pending)),
+        extra_body={"prompt_cache_key": "real_estate_scoring_v1"},
+    )
     try:
-        parsed = json.loads(eval_result.content.strip())
-        return parsed.get("score", 1.0), parsed.get("reason", "No reason provided")
+        parsed = orjson.loads(eval_result.choices[0].message.content)
+        for section_name, (key, _) in pending.items():
+            evaluation = parsed.get(section_name) or {}
+            scores[section_name] = (
+                evaluation.get("score", 1.0),
+                evaluation.get("reason", "No reason provided"),
+            )
+            if "score" in evaluation:
+                section_score_cache.set(key, scores[section_name])
     except Exception as e:
-        return 1.0, f"Failed to parse reason: {str(e)}"
-
-class EzSearchRequest(BaseModel):
-    query: str
+        for section_name in pending:
+            scores[section_name] = (1.0, f"Failed to parse reason: {str(e)}")
+    return scores
 
-@app.post("/ezSearch")
-async def ez_search(request: EzSearchRequest):
-    try:
-        client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
-        property_search_tool = {
-            "type": "function",
-            "function": {
-                "name": "property_search",
-                "description": "Search for properties based on various filters",
-                "parameters": {
+# /ezSearch tool schema and instructions, built once at import
+PROPERTY_SEARCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "property_search",
+        "description": "Search for properties based on various filters",
+        "parameters": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "address": {
+                    "type": "string",
+                    "description": "The address for the property search e.g. 1404 Willow Street, NC"
+                },
+                "filters": {
                     "type": "object",
                     "additionalProperties": False,
                     "properties": {
-                        "address": {
-                            "type": "string",
-                            "description": "The address for the property search e.g. 1404 Willow Street, NC"
+                        "minBeds": {"type": "integer", "description": "Minimum number of bedrooms "},
+                        "maxBeds": {"type": "integer", "description": "Maximum number of bedrooms"},
+                        "minBaths": {"type": "integer", "description": "Minimum number of bathrooms"},
+                        "maxBaths": {"type": "integer", "description": "Maximum number of bathrooms"},
+                        "minPrice": {"type": "integer", "description": "Minimum price"},
+                        "maxPrice": {"type": "integer", "description": "Maximum price"},
+                        "minSqft": {"type": "integer", "description": "Minimum square footage"},
+                        "maxSqft": {"type": "integer", "description": "Maximum square footage"},
+                        "propertySubType": {
+                            "type": "array",
+                            "items": {
+                                "type": "string",
+                                "enum": [
+                                    "Single Family Residence",
+                                    "Apartment",
+                                    "Cabin",
+                                    "Condominium",
+                                    "Duplex",
+                                    "Farm",
+                                    "Manufactured On Land",
+                                    "Quadruplex",
+                                    "Ranch",
+                                    "Townhouse",
+                                    "Triplex"
+                                ]
+                            },
+                            "description": "Property subtype e.g. Single family home, Quadruplex"
                         },
-                        "filters": {
-                            "type": "object",
-                            "additionalProperties": False,
-                            "properties": {
-                                "minBeds": {"type": "integer", "description": "Minimum number of bedrooms "},
-                                "maxBeds": {"type": "integer", "description": "Maximum number of bedrooms"},
-                                "minBaths": {"type": "integer", "description": "Minimum number of bathrooms"},
-                                "maxBaths": {"type": "integer", "description": "Maximum number of bathrooms"},
-                                "minPrice": {"type": "integer", "description": "Minimum price"},
-                                "maxPrice": {"type": "integer", "description": "Maximum price"},
-                                "minSqft": {"type": "integer", "description": "Minimum square footage"},
-                                "maxSqft": {"type": "integer", "description": "Maximum square footage"},
-                                "propertySubType": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                        "enum": [
-                                            "Single Family Residence",
-                                            "Apartment",
-                                            "Cabin",
-                                            "Condominium",
-                                            "Duplex",
-                                            "Farm",
-                                            "Manufactured On Land",
-                                            "Quadruplex",
-                                            "Ranch",
-                                            "Townhouse",
-                                            "Triplex"
-                                        ]
-                                    },
-                                    "description": "Property subtype e.g. Single family home, Quadruplex"
-                                },
-                                "poolFeatures": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                        "enum": [
-                                            "Above Ground Pool",
-                                            "Hot Tub",
-                                            "In Ground Pool",
-                                            "Swimming Pool Com/Fee",
-                                            "Swim Pool/Priv",
-                                            "Swim Pool/Priv. Com",
-                                            "Heated Pool",
-                                            "Salt Water Pool",
-                                            "Indoor Pool"
-                                        ]
-                                    },
-                                    "description": "Types of pools available in the listing i.e Hot Tub. Please note 'priv' means private and 'com' means community"
-                                },
-                                "parkingFeatures": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                        "enum": [
-                                            "Carport",
-                                            "Attached",
-                                            "Driveway",
-                                            "Garage",
-                                            "Garage Faces Front",
-                                            "Assigned Spaces",
-                                            "Attached",
-                                            "Covered Parking",
-                                            "Circular Drive",
-                                            "Driveway",
-                                            "Detached",
-                                            "Parking Lot",
-                                            "Street Parking",
-                                            "No Parking"
-                                        ]
-                                    },
-                                    "description": "Parking features e.g. Driveway"
-                                },
-                                "interiorFeatures": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                        "enum": [
-                                            "10Ft+ Ceiling",
-                                            "2nd Kitchen",
-                                            "9 Ft Ceiling",
-                                            "Apt/Suite",
-                                            "Automation",
-                                            "Bookshelves",
-                                            "Butler’s Pantry",
-                                            "Cable TV Available",
-                                            "Cathedral Ceiling",
-                                            "Ceiling Fan",
-                                            "Central Vac Finished",
-                                            "Central Vac Prewired",
-                                            "Coffered Ceiling",
-                                            "Distributed Audio",
-                                            "DSL Available",
-                                            "Garage Shop",
-                                            "Granite Counter Tops",
-                                            "Heated Floors",
-                                            "Intercom Finished",
-                                            "Intercom Prewired",
-                                            "Lighting Control",
-                                            "Interior Needs Repair",
-                                            "Paneling",
-                                            "Pantry",
-                                            "Plaster Wall",
-                                            "Quartz Counter Tops",
-                                            "Radon Mitigation Instld",
-                                            "Radon Mitigation Ready",
-                                            "Second Laundry",
-                                            "Security System Finished",
-                                            "Security System Prewired",
-                                            "Skylight(s)",
-                                            "Smoke Alarm",
-                                            "Solid Surface Counter Top",
-                                            "Tile Countertops",
-                                            "Tray Ceiling",
-                                            "Walk in Closet",
-                                            "Wet Bar"
-                                        ]
-                                    },
-                                    "description": "Features within the listing such as intercom and heated floors"
-                                },
-                                "accessibilityFeatures": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                        "enum": [
-                                            "36 in + Doorways",
-                                            "48 in + Doorways",
-                                            "Accessible Doors",
-                                            "Aging in Place",
-                                            "Barrier Free",
-                                            "Chair Lift",
-                                            "Elevator",
-                                            "Universal Access",
-                                            "Accessible Kitchen",
-                                            "Level Flooring",
-                                            "Levered Door",
-                                            "Main Floor Laundry",
-                                            "Near Public Transit",
-                                            "Roll Up Counters",
-                                            "Roll Windows",
-                                            "Serviced By Bus Line",
-                                            "Sliding/RotKitCab",
-                                            "Wheelchair Entry",
-                                            "Wheelchair Full Bath",
-                                            "Wheelchair Half Bath",
-                                            "Wheelchair Ramp"
-                                        ],
-                                        "description": "Accessibility features such as the ability ot have a wheelchair ramp or roll up counters"
-                                    }
-                                },
-                                "waterfrontFeatures": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                        "enum": [
-                                            "Bay/Harbor",
-                                            "Beach Sandy",
-                                            "Beach Rocky",
-                                            "Beach Grassy",
-                                            "Boat House",
-                                            "Boat Slip",
-                                            "Buoy Installed",
-                                            "Buoy Permit Available",
-                                            "Buoy Permit Obtained",
-                                            "Dock Community",
-                                            "Dock Floating",
-                                            "Dock Multi – Slip",
-                                            "Dock Permit Available",
-                                            "Dock Permit Obtained",
-                                            "Dock Private Installed",
-                                            "Dock Shared",
-                                            "Dock Single Slip",
-                                            "No Motor watercraft",
-                                            "On Cove",
-                                            "Pier",
-                                            "Public Boat Ramp < 1 mile",
-                                            "Publ. Boat Ramp 2-3 miles",
-                                            "Swimming not permitted",
-                                            "Water Front",
-                                            "Water View"
-                                        ],
-                                        "description": "Waterfront charateristics of the listing"
-                                    }
-                                },
-                                "waterSewer": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "string",
-                                        "enum": [
-                                            "City Sewer",
-                                            "City Water",
-                                            "Community Sewer",
-                                            "Community Water",
-                                            "County Sewer",
-                                            "County Water",
-                                            "Public",
-                                            "Sand Filter",
-                                            "Septic Tank",
-                                            "Well",
-                                            "No Water/Sewer"
-                                        ],
-                                        "description": "Water and sewer features of the listing"
-                                    }
-                                },
-                                "minLotSize": {"type": "integer", "description": "Minimum lot size, always return the value in acers, i.e 0.1"},
-                                "maxLotSize": {"type": "integer", "description": "Maximum lot size, always return value in acers, i.e 0.1"},
-                                "minGarageSpaces": {"type": "integer", "description": "Minimum number of garage spaces"},
-                                "maxGarageSpaces": {"type": "integer", "description": "Maximum number of garage spaces"},
-                                "features": {
-                                    "type": "array",
-                                    "items": {"type": "string"},
-                                    "description": "List of desired features e.g. backyard"
-                                }
+                        "poolFeatures": {
+                            "type": "array",
+                            "items": {
+                                "type": "string",
+                                "enum": [
+                                    "Above Ground Pool",
+                                    "Hot Tub",
+                                    "In Ground Pool",
+                                    "Swimming Pool Com/Fee",
+                                    "Swim Pool/Priv",
+                                    "Swim Pool/Priv. Com",
+                                    "Heated Pool",
+                                    "Salt Water Pool",
+                                    "Indoor Pool"
+                                ]
+                            },
+                            "description": "Types of pools available in the listing i.e Hot Tub. Please note 'priv' means private and 'com' means community"
+                        },
+                        "parkingFeatures": {
+                            "type": "array",
+                            "items": {
+                                "type": "string",
+                                "enum": [
+                                    "Carport",
+                                    "Attached",
+                                    "Driveway",
+                                    "Garage",
+                                    "Garage Faces Front",
+                                    "Assigned Spaces",
+                                    "Attached",
+                                    "Covered Parking",
+                                    "Circular Drive",
+                                    "Driveway",
+                                    "Detached",
+                                    "Parking Lot",
+                                    "Street Parking",
+                                    "No Parking"
+                                ]
                             },
-                            "required": [
-                                "minBeds",
-                                "maxBeds",
-                                "minBaths",
-                                "maxBaths",
-                                "minPrice",
-                                "maxPrice",
-                                "minSqft",
-                                "maxSqft",
-                                "propertySubType",
-                                "poolFeatures",
-                                "parkingFeatures",
-                                "interiorFeatures",
-                                "accessibilityFeatures",
-                                "waterfrontFeatures",
-                                "waterSewer",
-                                "minLotSize",
-                                "maxLotSize",
-                                "minGarageSpaces",
-                                "maxGarageSpaces",
-                                "features"
-                            ]
+                            "description": "Parking features e.g. Driveway"
+                        },
+                        "interiorFeatures": {
+                            "type": "array",
+                            "items": {
+                                "type": "string",
+                                "enum": [
+                                    "10Ft+ Ceiling",
+                                    "2nd Kitchen",
+                                    "9 Ft Ceiling",
+                                    "Apt/Suite",
+                                    "Automation",
+                                    "Bookshelves",
+                                    "Butler’s Pantry",
+                                    "Cable TV Available",
+                                    "Cathedral Ceiling",
+                                    "Ceiling Fan",
+                                    "Central Vac Finished",
+                                    "Central Vac Prewired",
+                                    "Coffered Ceiling",
+                                    "Distributed Audio",
+                                    "DSL Available",
+                                    "Garage Shop",
+                                    "Granite Counter Tops",
+                                    "Heated Floors",
+                                    "Intercom Finished",
+                                    "Intercom Prewired",
+                                    "Lighting Control",
+                                    "Interior Needs Repair",
+                                    "Paneling",
+                                    "Pantry",
+                                    "Plaster Wall",
+                                    "Quartz Counter Tops",
+                                    "Radon Mitigation Instld",
+                                    "Radon Mitigation Ready",
+                                    "Second Laundry",
+                                    "Security System Finished",
+                                    "Security System Prewired",
+                                    "Skylight(s)",
+                                    "Smoke Alarm",
+                                    "Solid Surface Counter Top",
+                                    "Tile Countertops",
+                                    "Tray Ceiling",
+                                    "Walk in Closet",
+                                    "Wet Bar"
+                                ]
+                            },
+                            "description": "Features within the listing such as intercom and heated floors"
+                        },
+                        "accessibilityFeatures": {
+                            "type": "array",
+                            "items": {
+                                "type": "string",
+                                "enum": [
+                                    "36 in + Doorways",
+                                    "48 in + Doorways",
+                                    "Accessible Doors",
+                                    "Aging in Place",
+                                    "Barrier Free",
+                                    "Chair Lift",
+                                    "Elevator",
+                                    "Universal Access",
+                                    "Accessible Kitchen",
+                                    "Level Flooring",
+                                    "Levered Door",
+                                    "Main Floor Laundry",
+                                    "Near Public Transit",
+                                    "Roll Up Counters",
+                                    "Roll Windows",
+                                    "Serviced By Bus Line",
+                                    "Sliding/RotKitCab",
+                                    "Wheelchair Entry",
+                                    "Wheelchair Full Bath",
+                                    "Wheelchair Half Bath",
+                                    "Wheelchair Ramp"
+                                ],
+                                "description": "Accessibility features such as the ability ot have a wheelchair ramp or roll up counters"
+                            }
+                        },
+                        "waterfrontFeatures": {
+                            "type": "array",
+                            "items": {
+                                "type": "string",
+                                "enum": [
+                                    "Bay/Harbor",
+                                    "Beach Sandy",
+                                    "Beach Rocky",
+                                    "Beach Grassy",
+                                    "Boat House",
+                                    "Boat Slip",
+                                    "Buoy Installed",
+                                    "Buoy Permit Available",
+                                    "Buoy Permit Obtained",
+                                    "Dock Community",
+                                    "Dock Floating",
+                                    "Dock Multi – Slip",
+                                    "Dock Permit Available",
+                                    "Dock Permit Obtained",
+                                    "Dock Private Installed",
+                                    "Dock Shared",
+                                    "Dock Single Slip",
+                                    "No Motor watercraft",
+                                    "On Cove",
+                                    "Pier",
+                                    "Public Boat Ramp < 1 mile",
+                                    "Publ. Boat Ramp 2-3 miles",
+                                    "Swimming not permitted",
+                                    "Water Front",
+                                    "Water View"
+                                ],
+                                "description": "Waterfront charateristics of the listing"
+                            }
+                        },
+                        "waterSewer": {
+                            "type": "array",
+                            "items": {
+                                "type": "string",
+                                "enum": [
+                                    "City Sewer",
+                                    "City Water",
+                                    "Community Sewer",
+                                    "Community Water",
+                                    "County Sewer",
+                                    "County Water",
+                                    "Public",
+                                    "Sand Filter",
+                                    "Septic Tank",
+                                    "Well",
+                                    "No Water/Sewer"
+                                ],
+                                "description": "Water and sewer features of the listing"
+                            }
+                        },
+                        "minLotSize": {"type": "integer", "description": "Minimum lot size, always return the value in acers, i.e 0.1"},
+                        "maxLotSize": {"type": "integer", "description": "Maximum lot size, always return value in acers, i.e 0.1"},
+                        "minGarageSpaces": {"type": "integer", "description": "Minimum number of garage spaces"},
+                        "maxGarageSpaces": {"type": "integer", "description": "Maximum number of garage spaces"},
+                        "features": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "List of desired features e.g. backyard"
                         }
                     },
-                    "required": ["address", "filters"]
-                },
-                "strict": True
-            }
-        }
+                    "required": [
+                        "minBeds",
+                        "maxBeds",
+                        "minBaths",
+                        "maxBaths",
+                        "minPrice",
+                        "maxPrice",
+                        "minSqft",
+                        "maxSqft",
+                        "propertySubType",
+                        "poolFeatures",
+                        "parkingFeatures",
+                        "interiorFeatures",
+                        "accessibilityFeatures",
+                        "waterfrontFeatures",
+                        "waterSewer",
+                        "minLotSize",
+                        "maxLotSize",
+                        "minGarageSpaces",
+                        "maxGarageSpaces",
+                        "features"
+                    ]
+                }
+            },
+            "required": ["address", "filters"]
+        },
+        "strict": True
+    }
+}
 
-        system_prompt = (
-            "You convert natural-language house search requests into a strict JSON matching the property_search function schema. "
-            "Rules: "
-            "1) Always return ONLY the function arguments JSON, valid per the schema. "
-            "2) Do NOT fabricate values. Infer only from the user's input or use safe defaults described below. "
-            "3) Address handling: If the user provides a location (address, city, neighborhood, ZIP, state), set address to that string. "
-            "If NO location is given, set address to an empty string (\"\"). Never invent or use example addresses. "
-            "4) When the user specifies exact counts (e.g., \"6 bedroom\"), set minBeds and maxBeds to that same value. Likewise for bathrooms and garage spaces. "
-            "5) **STRICTLY:** Do not use any default values. unless the user explicitly asks for it."
-            "6) Map style/type words to the closest propertySubType enum. Examples: single family -> Single Family Residence; ranch -> Ranch; condo -> Condominium; townhouse -> Townhouse; apartment -> Apartment; duplex -> Duplex; triplex -> Triplex; quadruplex -> Quadruplex; cabin -> Cabin; farm -> Farm; manufactured -> Manufactured On Land. "
-            "7) Pools: if user asks for a pool, choose an appropriate poolFeatures value (e.g., \"In Ground Pool\" if unspecified). If no pool mentioned, return an empty array. "
-            "8) Parking/garage: map \"parking\" or \"garage\" counts to minGarageSpaces/maxGarageSpaces. For parking features like driveway/garage/carport, add to parkingFeatures if explicitly mentioned. Otherwise leave empty. "
-            "9) Interior/accessibility/waterfront/waterSewer/features: include only if clearly requested; otherwise return empty arrays. "
-            "10) Never add fields outside the schema; adhere to enums exactly. "
-            "13) DO not use any default values. unless the user explicitly asks for it."
-            "12) Always return a valid JSON which is part of the property_search function added as OPEN API specification. "
-            "13)Stick always to the response from property_search function only!"
-        )
+EZ_SEARCH_SYSTEM_PROMPT = (
+    "You convert natural-language house search requests into a strict JSON matching the property_search function schema. "
+    "Rules: "
+    "1) Always return ONLY the function arguments JSON, valid per the schema. "
+    "2) Do NOT fabricate values. Infer only from the user's input or use safe defaults described below. "
+    "3) Address handling: If the user provides a location (address, city, neighborhood, ZIP, state), set address to that string. "
+    "If NO location is given, set address to an empty string (\"\"). Never invent or use example addresses. "
+    "4) When the user specifies exact counts (e.g., \"6 bedroom\"), set minBeds and maxBeds to that same value. Likewise for bathrooms and garage spaces. "
+    "5) **STRICTLY:** Do not use any default values. unless the user explicitly asks for it."
+    "6) Map style/type words to the closest propertySubType enum. Examples: single family -> Single Family Residence; ranch -> Ranch; condo -> Condominium; townhouse -> Townhouse; apartment -> Apartment; duplex -> Duplex; triplex -> Triplex; quadruplex -> Quadruplex; cabin -> Cabin; farm -> Farm; manufactured -> Manufactured On Land. "
+    "7) Pools: if user asks for a pool, choose an appropriate poolFeatures value (e.g., \"In Ground Pool\" if unspecified). If no pool mentioned, return an empty array. "
+    "8) Parking/garage: map \"parking\" or \"garage\" counts to minGarageSpaces/maxGarageSpaces. For parking features like driveway/garage/carport, add to parkingFeatures if explicitly mentioned. Otherwise leave empty. "
+    "9) Interior/accessibility/waterfront/waterSewer/features: include only if clearly requested; otherwise return empty arrays. "
+    "10) Never add fields outside the schema; adhere to enums exactly. "
+    "13) DO not use any default values. unless the user explicitly asks for it."
+    "12) Always return a valid JSON which is part of the property_search function added as OPEN API specification. "
+    "13)Stick always to the response from property_search function only!"
+)
+
+class EzSearchRequest(BaseModel):
+    query: str
 
-        response = client.chat.completions.create(
+# Search queries repeat a lot ("3 bed in raleigh"); results are keyed by the query with
+# case and whitespace normalized
+search_cache = ResponseCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "1024")),
+    ttl=int(os.getenv("SEARCH_CACHE_TTL", "3600")),
+)
+
+def search_cache_key(endpoint, query, ignore_case=False):
+    """Key on the whitespace-normalized query. Only endpoints whose output doesn't echo
+    the query's casing (e.g. street names) may also ignore case"""
+    query = " ".join(query.split())
+    return prompt_cache_key(endpoint, query.lower() if ignore_case else query)
+
+@app.post("/ezSearch")
+async def ez_search(request: EzSearchRequest):
+    cache_key = search_cache_key("ezSearch", request.query)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    try:
+        response = await openai_client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": EZ_SEARCH_SYSTEM_PROMPT},
                 {"role": "user", "content": request.query}
             ],
-            tools=[property_search_tool],
+            tools=[PROPERTY_SEARCH_TOOL],
             tool_choice={"type": "function", "function": {"name": "property_search"}},
-            temperature=0
+            temperature=0,
+            extra_body={"prompt_cache_key": "property_search_v1"},
         )
 
         choice = response.choices[0]
@@ -643,202 +1197,274 @@ async def ez_search(request: EzSearchRequest):
             # Fallback: try to parse raw content as JSON
             raw = choice.message.content or "{}"
             try:
-                parsed = json.loads(clean_json(raw))
+                parsed = orjson.loads(clean_json(raw))
             except Exception:
                 raise HTTPException(status_code=422, detail="Model did not return a tool call or valid JSON")
-            return JSONResponse(content=parsed)
+            search_cache.set(cache_key, parsed)
+            return parsed
 
         # Extract the first tool call arguments
         args_text = tool_calls[0].function.arguments or "{}"
-        parsed_args = json.loads(clean_json(args_text))
-        return JSONResponse(content=parsed_args)
+        # Strict tool schemas guarantee well-formed arguments, so clean_json is only a fallback
+        try:
+            parsed_args = orjson.loads(args_text)
+        except orjson.JSONDecodeError:
+            parsed_args = orjson.loads(clean_json(args_text))
+        search_cache.set(cache_key, parsed_args)
+        return parsed_args
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# /filterSearch tool schema, built once at import
+FILTER_FIELD_NAMES = [
+    "AboveGradeFinishedArea",
+    "GarageSpaces",
+    "LotSizeAcres",
+    "BedsTotal",
+    "PublicRemarks",
+    "PostalCode",
+    "UnparsedAddress",
+    "BathroomsTotalInteger",
+    "HighSchool",
+    "MiddleOrJuniorSchool",
+    "ElementarySchool",
+    "HorseAmenities.Other",
+    "WaterfrontFeatures.Creek",
+    "WaterfrontFeatures.Stream",
+    "WaterfrontFeatures.Lake",
+    "WaterfrontFeatures.River Front",
+    "WaterfrontFeatures.Beach Access",
+    "WaterfrontFeatures.Canal Front",
+    "WaterfrontFeatures.Ocean Front",
+    "ArchitecturalStyle.Bungalow",
+    "ArchitecturalStyle.A-Frame",
+    "ArchitecturalStyle.Contemporary",
+    "ArchitecturalStyle.Williamsburg",
+    "ArchitecturalStyle.Cape Cod",
+    "ArchitecturalStyle.Farm House",
+    "ArchitecturalStyle.Colonial",
+    "ArchitecturalStyle.Warehouse",
+    "ArchitecturalStyle.Georgian",
+    "ArchitecturalStyle.Tudor",
+    "ArchitecturalStyle.Spanish",
+    "ArchitecturalStyle.Victorian",
+    "ArchitecturalStyle.Rustic",
+    "ArchitecturalStyle.Craftsman",
+    "ArchitecturalStyle.Deck House",
+    "ArchitecturalStyle.Log Home",
+    "ArchitecturalStyle.French Province",
+    "ArchitecturalStyle.Charleston",
+    "ArchitecturalStyle.Modernist",
+    "ArchitecturalStyle.Cottage",
+    "ArchitecturalStyle.Geodesic",
+    "ArchitecturalStyle.National Historic Designation",
+    "ArchitecturalStyle.Local Historic Designation",
+    "ArchitecturalStyle.State Historic Designation",
+    "ArchitecturalStyle.Log",
+    "PoolFeatures.Private",
+    "PoolFeatures.Swimming Pool Com/Fee",
+    "PoolFeatures.None",
+    "PoolFeatures.Association",
+    "PoolFeatures.Fenced",
+    "PoolFeatures.Above Ground",
+    "PoolFeatures.Tile",
+    "PoolFeatures.Outdoor Pool",
+    "PoolFeatures.Pool/Spa Combo",
+    "PoolFeatures.Gunite",
+    "PoolFeatures.Filtered",
+    "PoolFeatures.Gas Heat",
+    "PoolFeatures.Indoor",
+    "PoolFeatures.Waterfall",
+    "ParkingFeatures.Garage",
+    "ParkingFeatures.Covered",
+    "ParkingFeatures.Concrete",
+    "ParkingFeatures.Driveway",
+    "ParkingFeatures.Attached",
+    "ParkingFeatures.Off Street",
+    "ParkingFeatures.Circular Driveway",
+    "ParkingFeatures.Assigned",
+    "ParkingFeatures.Parking Lot",
+    "ParkingFeatures.On Street",
+    "ParkingFeatures.Basement",
+    "ParkingFeatures.None",
+    "ParkingFeatures.Garage Door Opener",
+    "ParkingFeatures.Garage Faces Side",
+    "ParkingFeatures.Garage Faces Front",
+    "ParkingFeatures.Garage Faces Rear",
+    "ParkingFeatures.Electric Vehicle Charging Station(s)",
+    "ParkingFeatures.Carport",
+    "ParkingFeatures.Parking Pad",
+    "ParkingFeatures.Gravel",
+    "ParkingFeatures.Asphalt",
+    "ParkingFeatures.Workshop in Garage",
+    "ParkingFeatures.Inside Entrance",
+    "ParkingFeatures.Detached",
+    "ParkingFeatures.Unpaved",
+    "ParkingFeatures.Paved",
+    "ParkingFeatures.Shared Driveway",
+    "ParkingFeatures.Additional Parking",
+    "ParkingFeatures.Other",
+    "ParkingFeatures.Lighted",
+    "ParkingFeatures.Kitchen Level",
+    "ParkingFeatures.Oversized",
+    "ParkingFeatures.Private",
+    "ParkingFeatures.Common",
+    "ParkingFeatures.Guest",
+    "ParkingFeatures.Secured",
+    "ParkingFeatures.Deeded",
+    "ParkingFeatures.On Site",
+    "ParkingFeatures.Storage",
+    "ParkingFeatures.Attached Carport",
+    "ParkingFeatures.Alley Access",
+    "ParkingFeatures.No Garage",
+    "ParkingFeatures.Deck",
+    "ParkingFeatures.Drive Through",
+    "ParkingFeatures.Detached Carport",
+    "PropertyClass",
+    "PropertySubType",
+    "YearBuilt",
+    "MlsStatus",
+    "ListPrice"
+]
+
+FILTER_SEARCH_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "filter_search",
+        "description": "Perform a filter-based search using an array of filter objects",
+        "parameters": {
+            "type": "object",
+            "additionalProperties": False,
+            "properties": {
+                "filters": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "additionalProperties": False,
+                        "properties": {
+                            "fieldName": {
+                                "type": "string",
+                                "enum": FILTER_FIELD_NAMES,
+                                "description": "Field to filter on"
+                            },
+                            "operator": {
+                                "type": "string",
+                                "enum": [":=", ":!=", ":", ":>", ":<", ":>=", ":<=", ":=true", ":=false"],
+                                "description": "Filter operator"
+                            },
+                            "value": {
+                                "type": "string",
+                                "description": "Value to compare against"
+                            }
+                        },
+                        "required": ["fieldName", "operator", "value"]
+                    }
+                }
+            },
+            "required": ["filters"]
+        },
+        "strict": True
+    }
+}
+
+# /filterSearch instructions, built once at import so the system message is byte-identical
+# across requests
+FILTER_SEARCH_SYSTEM_PROMPT = (
+    "You convert natural-language filter requests into the function schema with an array 'filters' of filter objects. "
+    "Output ONLY the function arguments JSON with a top-level 'filters' array. Do not add extra keys. "
+    "Each filter object must have fieldName (from enum), operator (from enum), and value (string). "
+    "If multiple constraints are present (type, pool, price, location), include multiple filter objects. "
+    "Numeric rules for [BedsTotal, BathroomsTotalInteger, GarageSpaces, LotSizeAcres, AboveGradeFinishedArea, YearBuilt, ListPrice]: "
+    "- 'at least N' => :>= N; 'more than N' => :> N; 'at most N' => :<= N; 'less than N' => :< N; 'exactly N' => := N. "
+    "Formatting: value is a plain number string (no commas/units) for numeric fields. "
+    "Location mapping: if a city or place is mentioned (e.g., Raleigh), add a filter {fieldName:'UnparsedAddress', operator:':', value:'Raleigh'}. "
+    "Property type mapping: 'single family' => PropertySubType := 'Single Family Residence'. "
+    "Pool present: map to an appropriate PoolFeatures.* enum; when generic just use 'PoolFeatures.Private'. "
+    "Return a compact array in the 'filters' field only."
+)
+
 class FilterSearchRequest(BaseModel):
     query: str
 
+class SemanticCache:
+    """Nearest-neighbour cache over unit-length query embeddings, held in a fixed-size ring buffer."""
+
+    def __init__(self, maxsize, threshold):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self._vectors = None
+        # hash of each entry's guard, so non-matching guards can be masked out in one vector op
+        self._guard_hashes = np.zeros(maxsize, dtype=np.int64)
+        self._entries = [None] * maxsize
+        self._size = 0
+        self._next = 0
+
+    def get(self, vector, guard):
+        if not self._size:
+            return None
+        similarities = self._vectors[:self._size] @ vector
+        # Only entries with the same guard may match, so they compete for the nearest slot
+        similarities[self._guard_hashes[:self._size] != hash(guard)] = -np.inf
+        best = int(np.argmax(similarities))
+        entry_guard, value = self._entries[best]
+        if similarities[best] >= self.threshold and entry_guard == guard:
+            return value
+        return None
+
+    def set(self, vector, guard, value):
+        if self._vectors is None:
+            self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+        self._vectors[self._next] = vector
+        self._guard_hashes[self._next] = hash(guard)
+        self._entries[self._next] = (guard, value)
+        self._next = (self._next + 1) % self.maxsize
+        self._size = min(self._size + 1, self.maxsize)
+
+# With FILTER_SEMANTIC_CACHE=1, /filterSearch reuses the filters of an earlier query whose
+# embedding is close enough. The numbers in both queries must match exactly, since
+# "under 400000" and "under 500000" embed almost identically
+FILTER_SEMANTIC_CACHE = os.getenv("FILTER_SEMANTIC_CACHE") == "1"
+filter_semantic_cache = SemanticCache(
+    maxsize=int(os.getenv("FILTER_SEMANTIC_CACHE_SIZE", "10000")),
+    threshold=float(os.getenv("FILTER_SEMANTIC_THRESHOLD", "0.95")),
+)
+_NUMBER_RE = re.compile(r'\d[\d,.]*')
+
+async def embed_query(query):
+    response = await openai_client.embeddings.create(model="text-embedding-3-small", input=query)
+    vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
 @app.post("/filterSearch")
 async def filter_search_endpoint(request: FilterSearchRequest):
+    cache_key = search_cache_key("filterSearch", request.query, ignore_case=True)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    query_vector = None
+    query_numbers = tuple(_NUMBER_RE.findall(request.query))
+    if FILTER_SEMANTIC_CACHE:
+        try:
+            query_vector = await embed_query(request.query)
+            cached = filter_semantic_cache.get(query_vector, query_numbers)
+            if cached is not None:
+                search_cache.set(cache_key, cached)
+                return cached
+        except Exception as e:
+            logger.warning("filterSearch semantic cache lookup failed: %s", e)
     try:
-        client = openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
-        field_enum = [
-            "AboveGradeFinishedArea",
-            "GarageSpaces",
-            "LotSizeAcres",
-            "BedsTotal",
-            "PublicRemarks",
-            "PostalCode",
-            "UnparsedAddress",
-            "BathroomsTotalInteger",
-            "HighSchool",
-            "MiddleOrJuniorSchool",
-            "ElementarySchool",
-            "HorseAmenities.Other",
-            "WaterfrontFeatures.Creek",
-            "WaterfrontFeatures.Stream",
-            "WaterfrontFeatures.Lake",
-            "WaterfrontFeatures.River Front",
-            "WaterfrontFeatures.Beach Access",
-            "WaterfrontFeatures.Canal Front",
-            "WaterfrontFeatures.Ocean Front",
-            "ArchitecturalStyle.Bungalow",
-            "ArchitecturalStyle.A-Frame",
-            "ArchitecturalStyle.Contemporary",
-            "ArchitecturalStyle.Williamsburg",
-            "ArchitecturalStyle.Cape Cod",
-            "ArchitecturalStyle.Farm House",
-            "ArchitecturalStyle.Colonial",
-            "ArchitecturalStyle.Warehouse",
-            "ArchitecturalStyle.Georgian",
-            "ArchitecturalStyle.Tudor",
-            "ArchitecturalStyle.Spanish",
-            "ArchitecturalStyle.Victorian",
-            "ArchitecturalStyle.Rustic",
-            "ArchitecturalStyle.Craftsman",
-            "ArchitecturalStyle.Deck House",
-            "ArchitecturalStyle.Log Home",
-            "ArchitecturalStyle.French Province",
-            "ArchitecturalStyle.Charleston",
-            "ArchitecturalStyle.Modernist",
-            "ArchitecturalStyle.Cottage",
-            "ArchitecturalStyle.Geodesic",
-            "ArchitecturalStyle.National Historic Designation",
-            "ArchitecturalStyle.Local Historic Designation",
-            "ArchitecturalStyle.State Historic Designation",
-            "ArchitecturalStyle.Log",
-            "PoolFeatures.Private",
-            "PoolFeatures.Swimming Pool Com/Fee",
-            "PoolFeatures.None",
-            "PoolFeatures.Association",
-            "PoolFeatures.Fenced",
-            "PoolFeatures.Above Ground",
-            "PoolFeatures.Tile",
-            "PoolFeatures.Outdoor Pool",
-            "PoolFeatures.Pool/Spa Combo",
-            "PoolFeatures.Gunite",
-            "PoolFeatures.Filtered",
-            "PoolFeatures.Gas Heat",
-            "PoolFeatures.Indoor",
-            "PoolFeatures.Waterfall",
-            "ParkingFeatures.Garage",
-            "ParkingFeatures.Covered",
-            "ParkingFeatures.Concrete",
-            "ParkingFeatures.Driveway",
-            "ParkingFeatures.Attached",
-            "ParkingFeatures.Off Street",
-            "ParkingFeatures.Circular Driveway",
-            "ParkingFeatures.Assigned",
-            "ParkingFeatures.Parking Lot",
-            "ParkingFeatures.On Street",
-            "ParkingFeatures.Basement",
-            "ParkingFeatures.None",
-            "ParkingFeatures.Garage Door Opener",
-            "ParkingFeatures.Garage Faces Side",
-            "ParkingFeatures.Garage Faces Front",
-            "ParkingFeatures.Garage Faces Rear",
-            "ParkingFeatures.Electric Vehicle Charging Station(s)",
-            "ParkingFeatures.Carport",
-            "ParkingFeatures.Parking Pad",
-            "ParkingFeatures.Gravel",
-            "ParkingFeatures.Asphalt",
-            "ParkingFeatures.Workshop in Garage",
-            "ParkingFeatures.Inside Entrance",
-            "ParkingFeatures.Detached",
-            "ParkingFeatures.Unpaved",
-            "ParkingFeatures.Paved",
-            "ParkingFeatures.Shared Driveway",
-            "ParkingFeatures.Additional Parking",
-            "ParkingFeatures.Other",
-            "ParkingFeatures.Lighted",
-            "ParkingFeatures.Kitchen Level",
-            "ParkingFeatures.Oversized",
-            "ParkingFeatures.Private",
-            "ParkingFeatures.Common",
-            "ParkingFeatures.Guest",
-            "ParkingFeatures.Secured",
-            "ParkingFeatures.Deeded",
-            "ParkingFeatures.On Site",
-            "ParkingFeatures.Storage",
-            "ParkingFeatures.Attached Carport",
-            "ParkingFeatures.Alley Access",
-            "ParkingFeatures.No Garage",
-            "ParkingFeatures.Deck",
-            "ParkingFeatures.Drive Through",
-            "ParkingFeatures.Detached Carport",
-            "PropertyClass",
-            "PropertySubType",
-            "YearBuilt",
-            "MlsStatus",
-            "ListPrice"
-        ]
-
-        filter_search_tool = {
-            "type": "function",
-            "function": {
-                "name": "filter_search",
-                "description": "Perform a filter-based search using an array of filter objects",
-                "parameters": {
-                    "type": "object",
-                    "additionalProperties": False,
-                    "properties": {
-                        "filters": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "additionalProperties": False,
-                                "properties": {
-                                    "fieldName": {
-                                        "type": "string",
-                                        "enum": field_enum,
-                                        "description": "Field to filter on"
-                                    },
-                                    "operator": {
-                                        "type": "string",
-                                        "enum": [":=", ":!=", ":", ":>", ":<", ":>=", ":<=", ":=true", ":=false"],
-                                        "description": "Filter operator"
-                                    },
-                                    "value": {
-                                        "type": "string",
-                                        "description": "Value to compare against"
-                                    }
-                                },
-                                "required": ["fieldName", "operator", "value"]
-                            }
-                        }
-                    },
-                    "required": ["filters"]
-                },
-                "strict": True
-            }
-        }
-
-        system_prompt = (
-            "You convert natural-language filter requests into the function schema with an array 'filters' of filter objects. "
-            "Output ONLY the function arguments JSON with a top-level 'filters' array. Do not add extra keys. "
-            "Each filter object must have fieldName (from enum), operator (from enum), and value (string). "
-            "If multiple constraints are present (type, pool, price, location), include multiple filter objects. "
-            "Numeric rules for [BedsTotal, BathroomsTotalInteger, GarageSpaces, LotSizeAcres, AboveGradeFinishedArea, YearBuilt, ListPrice]: "
-            "- 'at least N' => :>= N; 'more than N' => :> N; 'at most N' => :<= N; 'less than N' => :< N; 'exactly N' => := N. "
-            "Formatting: value is a plain number string (no commas/units) for numeric fields. "
-            "Location mapping: if a city or place is mentioned (e.g., Raleigh), add a filter {fieldName:'UnparsedAddress', operator:':', value:'Raleigh'}. "
-            "Property type mapping: 'single family' => PropertySubType := 'Single Family Residence'. "
-            "Pool present: map to an appropriate PoolFeatures.* enum; when generic just use 'PoolFeatures.Private'. "
-            "Return a compact array in the 'filters' field only."
-        )
-
-        response = client.chat.completions.create(
+        response = await openai_client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
-                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": FILTER_SEARCH_SYSTEM_PROMPT},
                 {"role": "user", "content": request.query}
             ],
-            tools=[filter_search_tool],
+            tools=[FILTER_SEARCH_TOOL],
             tool_choice={"type": "function", "function": {"name": "filter_search"}},
-            temperature=0
+            temperature=0,
+            extra_body={"prompt_cache_key": "filter_search_v1"},
         )
 
         choice = response.choices[0]
@@ -846,7 +1472,7 @@ async def filter_search_endpoint(request: FilterSearchRequest):
         if not tool_calls:
             raw = choice.message.content or "{}"
             try:
-                parsed = json.loads(clean_json(raw))
+                parsed = orjson.loads(clean_json(raw))
             except Exception:
                 raise HTTPException(status_code=422, detail="Model did not return a tool call or valid JSON")
             # Normalize to filters array
@@ -858,10 +1484,17 @@ async def filter_search_endpoint(request: FilterSearchRequest):
                 filters = [parsed]
             else:
                 filters = []
-            return JSONResponse(content=filters)
+            search_cache.set(cache_key, filters)
+            if query_vector is not None:
+                filter_semantic_cache.set(query_vector, query_numbers, filters)
+            return filters
 
         args_text = tool_calls[0].function.arguments or "{}"
-        parsed_args = json.loads(clean_json(args_text))
+        # Strict tool schemas guarantee well-formed arguments, so clean_json is only a fallback
+        try:
+            parsed_args = orjson.loads(args_text)
+        except orjson.JSONDecodeError:
+            parsed_args = orjson.loads(clean_json(args_text))
         # Normalize to filters array
         if isinstance(parsed_args, dict) and "filters" in parsed_args:
             filters = parsed_args["filters"]
@@ -871,7 +1504,10 @@ async def filter_search_endpoint(request: FilterSearchRequest):
             filters = [parsed_args]
         else:
             filters = []
-        return JSONResponse(content=filters)
+        search_cache.set(cache_key, filters)
+        if query_vector is not None:
+            filter_semantic_cache.set(query_vector, query_numbers, filters)
+        return filters
     except HTTPException:
         raise
     except Exception as e:
@@ -879,4 +1515,14 @@ async def filter_search_endpoint(request: FilterSearchRequest):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Each worker has its own caches and prompt-refresh loop, so scaling out is left to
+    # WEB_CONCURRENCY. Multiple workers need the app as an import string; uvloop isn't
+    # available on Windows
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="auto" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        workers=WEB_CONCURRENCY,
+    )
\ No newline at end of file
@@ -1,10 +1,12 @@
 import requests
 import os
 import time
+import random
 import dns.resolver
 import boto3
 from cloudflare import Cloudflare
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 from dotenv import load_dotenv
@@ -41,11 +43,14 @@ aws_session = boto3.Session(
 )
 
 elb = aws_session.client("elbv2")
+# One resolver for every lookup; fail fast instead of the default multi-retry wait
+resolver = dns.resolver.Resolver()
+resolver.lifetime = 3.0
 # === CONFIG END ===
 
 def verify_cname(domain, expected):
     try:
-        result = dns.resolver.resolve(domain, "CNAME")
+        result = resolver.resolve(domain, "CNAME")
         for r in result:
             cname_target = str(r.target).rstrip(".").lower()
             print(f"CNAME for {domain} points to {cname_target}")
@@ -58,9 +63,12 @@ def verify_cname(domain, expected):
 def wait_for_cf_ssl(client, zone_id, hostname, timeout=300):
     print(f" Checking SSL Status for {hostname}  ...")
     start = time.time()
+    # Back off 1s, 2s, 4s ... up to 30s, so fast activations are caught quickly without
+    # hammering the API on slow ones
+    delay = 1.0
     while time.time() - start < timeout:
-        # Get hostname by listing and matching
-        hostnames = client.custom_hostnames.list(zone_id=zone_id).result
+        # Ask Cloudflare for just this hostname instead of listing the whole zone
+        hostnames = client.custom_hostnames.list(zone_id=zone_id, hostname=hostname).result
         hostname_obj = next((h for h in hostnames if h.hostname == hostname), None)
 
         if not hostname_obj:
@@ -72,7 +80,8 @@ def wait_for_cf_ssl(client, zone_id, hostname, timeout=300):
         if ssl_status == "active":
             print("SSL is active")
             return hostname_obj
-        time.sleep(10)
+        time.sleep(min(delay + random.uniform(0, 0.3), max(0, timeout - (time.time() - start))))
+        delay = min(delay * 2, 30)
     print(" Timed out waiting for SSL")
     return None
 
@@ -83,7 +92,10 @@ def get_next_priority(listener_arn):
     return max(priorities, default=1) + 1
 
 
-def update_existing_alb_rule(rule_arn, new_domain):
+def update_existing_alb_rule(rule_arn, new_domains):
+    # Accepts one domain or a list; all of them go into a single modify_rule call
+    if isinstance(new_domains, str):
+        new_domains = [new_domains]
     rule = elb.describe_rules(RuleArns=[rule_arn])["Rules"][0]
     existing_domains = []
 
@@ -92,11 +104,16 @@ def update_existing_alb_rule(rule_arn, new_domain):
             existing_domains = cond["HostHeaderConfig"]["Values"]
             break
 
-    if new_domain in existing_domains:
-        print(f" Rule already exists for '{new_domain}'")
+    added_domains = []
+    for new_domain in dict.fromkeys(new_domains):
+        if new_domain in existing_domains:
+            print(f" Rule already exists for '{new_domain}'")
+        else:
+            added_domains.append(new_domain)
+    if not added_domains:
         return
 
-    updated_domains = sorted(existing_domains + [new_domain])
+    updated_domains = sorted(existing_domains + added_domains)
 
     elb.modify_rule(
         RuleArn=rule_arn,
@@ -108,22 +125,36 @@ def update_existing_alb_rule(rule_arn, new_domain):
         }]
     )
 
-    print(f"Added '{new_domain}' to existing ALB rule.")
+    for new_domain in added_domains:
+        print(f"Added '{new_domain}' to existing ALB rule.")
+
+
+def check_domain(domain):
+    if not verify_cname(domain, ssl_proxy_url):
+        print(f"Domain CNAME for {domain} does not match expected proxy.")
+        # exit(1)
+    return wait_for_cf_ssl(client, ezd_zone_id, domain)
 
 
 # === MAIN ===
 if len(sys.argv) > 1:
-    domain = sys.argv[1].strip()
+    domains = [d.strip() for d in sys.argv[1:] if d.strip()]
 else:
-    domain = input("Enter your domain (e.g., portal.domain.com): ").strip()
-
-if not verify_cname(domain, ssl_proxy_url):
-    print("Domain CNAME does not match expected proxy.")
-    # exit(1)
-
-hostname_obj = wait_for_cf_ssl(client, ezd_zone_id, domain)
-if not hostname_obj:
+    domains = input("Enter your domain(s), space separated (e.g., portal.domain.com): ").split()
+
+# DNS and SSL checks are independent per domain, so they run side by side; only the
+# shared ALB rule update happens once at the end
+with ThreadPoolExecutor(max_workers=max(1, min(len(domains), 8))) as pool:
+    hostname_objs = list(pool.map(check_domain, domains))
+
+ready_domains = [d for d, hostname_obj in zip(domains, hostname_objs) if hostname_obj]
+for d, hostname_obj in zip(domains, hostname_objs):
+    if not hostname_obj:
+        print(f"Skipping {d} due to inactive SSL.")
+if not ready_domains:
     print("Aborting due to inactive SSL.")
     exit(1)
 
-update_existing_alb_rule(EXISTING_RULE_ARN, domain)
+update_existing_alb_rule(EXISTING_RULE_ARN, ready_domains)
+if len(ready_domains) < len(domains):
+    exit(1)
@@ -23,19 +23,32 @@ Usage (PowerShell examples):
   # Remove domain
   python .\auth0_manager.py remove portal.example.com [optional-client-id]
 
+  # Add or remove several domains with a single Auth0 update
+  python .\auth0_manager.py add portal.example.com,app.example.com [optional-client-id]
+
   # List URLs
   python .\auth0_manager.py list [optional-client-id]
 """
 
+import atexit
+import base64
 import os
 import sys
 import json
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # stdlib json is enough, just slower on clients with long URL lists
+    orjson = None
+
 # --- Load environment variables from .env next to this file ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ENV_PATH = os.path.join(SCRIPT_DIR, ".env")
@@ -63,14 +76,31 @@ try:
 except Exception:
     pass
 
+# --- HTTP session ---
+# Every call goes to the same AUTH0_DOMAIN, so a pooled session lets back-to-back calls
+# (token, GET client, PATCH client) reuse one TLS connection
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10))
+_SESSION.headers.update({"Content-Type": "application/json"})
+atexit.register(_SESSION.close)
+
 # --- Token cache ---
 _token_cache: Dict[str, Optional[str]] = {
     "access_token": None,
     "expires_at": None,  # datetime
 }
+# Tokens live ~24h, so they are also kept on disk and reused by later CLI runs
+TOKEN_CACHE_PATH = os.path.join(SCRIPT_DIR, ".auth0_token.json")
+
+# --- Client details cache ---
+# client_id -> (fetched_at, client). Multi-step workflows read the same client several
+# times in a row; every successful PATCH drops the entry so the next read is fresh.
+_CLIENT_CACHE_TTL = timedelta(seconds=30)
+_CLIENT_CACHE: Dict[str, Tuple[datetime, Dict]] = {}
 
 
 # --- Helpers (aligned with existing domain normalization style) ---
+@lru_cache(maxsize=1024)
 def normalize_domain(d: str) -> str:
     d = (d or "").strip().lower()
     if d.startswith("http://"):
@@ -83,23 +113,91 @@ def normalize_domain(d: str) -> str:
     return d
 
 
-def domain_variants(custom_domain: str) -> List[str]:
+# Cached, so this returns an immutable tuple that callers only iterate
+@lru_cache(maxsize=1024)
+def domain_variants(custom_domain: str) -> Tuple[str, ...]:
     base = normalize_domain(custom_domain)
     base_no_www = base[4:] if base.startswith("www.") else base
-    variants: List[str] = []
-    for v in [base_no_www, f"www.{base_no_www}"]:
-        if v and v not in variants:
-            variants.append(v)
-    return variants
+    return tuple(v for v in dict.fromkeys((base_no_www, f"www.{base_no_www}")) if v)
+
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    _json_loads = json.loads
+
+
+def _print_json(obj) -> None:
+    """Write obj to stdout as a single JSON line; fast.py parses this output."""
+    sys.stdout.flush()
+    out = getattr(sys.stdout, "buffer", None)
+    if out is None:
+        print(_json_dumps(obj).decode("utf-8"))
+        return
+    out.write(_json_dumps(obj) + b"\n")
+    out.flush()
+
+
+def _print_error(e: Exception) -> None:
+    """Print the Auth0 error body (JSON if possible) attached to a failed request, if any."""
+    resp = getattr(e, "response", None)
+    if resp is None:
+        return
+    try:
+        print(json.dumps(resp.json(), indent=2))
+    except ValueError:
+        print(resp.text)
 
 
 # --- Auth0 token management ---
+def _load_cached_token() -> Optional[str]:
+    """Reuse a token saved by an earlier run if it was issued for this tenant/client and is still valid."""
+    try:
+        with open(TOKEN_CACHE_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        expires_at = datetime.fromisoformat(data["expires_at"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if (data.get("domain"), data.get("client_id"), data.get("scope")) != (AUTH0_DOMAIN, AUTH0_CLIENT_ID, AUTH0_MGMT_SCOPE):
+        return None
+    token = data.get("access_token")
+    if not token or datetime.now() >= expires_at:
+        return None
+    _token_cache["access_token"] = token
+    _token_cache["expires_at"] = expires_at
+    return token
+
+
+def _save_cached_token(token: str, expires_at: datetime) -> None:
+    """Write the token to TOKEN_CACHE_PATH (mode 0600); os.replace keeps concurrent runs from seeing a partial file."""
+    tmp_path = f"{TOKEN_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        fd = os.open(tmp_path, os.O_CREAT | os.O_WRONLY | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "domain": AUTH0_DOMAIN,
+                "client_id": AUTH0_CLIENT_ID,
+                "scope": AUTH0_MGMT_SCOPE,
+                "access_token": token,
+                "expires_at": expires_at.isoformat(),
+            }, f)
+        os.replace(tmp_path, TOKEN_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: could not cache Auth0 token at {TOKEN_CACHE_PATH}: {e}", file=sys.stderr)
+
+
 def get_management_token() -> Optional[str]:
     """Get or refresh an Auth0 Management API token using client credentials."""
     access_token = _token_cache.get("access_token")
     expires_at = _token_cache.get("expires_at")
     if access_token and isinstance(expires_at, datetime) and datetime.now() < expires_at:
         return access_token
+    access_token = _load_cached_token()
+    if access_token:
+        return access_token
 
     if not (AUTH0_DOMAIN and AUTH0_CLIENT_ID and AUTH0_CLIENT_SECRET):
         print("Error: AUTH0_DOMAIN, AUTH0_CLIENT_ID, or AUTH0_CLIENT_SECRET not set in .env")
@@ -116,9 +214,9 @@ def get_management_token() -> Optional[str]:
         # Optionally request specific scopes (must be authorized for the M2M app)
         if AUTH0_MGMT_SCOPE:
             payload["scope"] = AUTH0_MGMT_SCOPE
-        resp = requests.post(url, json=payload, timeout=25)
+        resp = _SESSION.post(url, data=_json_dumps(payload), timeout=25)
         resp.raise_for_status()
-        data = resp.json() or {}
+        data = _json_loads(resp.content) or {}
         token = data.get("access_token")
         expires_in = int(data.get("expires_in", 86400))
         if not token:
@@ -127,15 +225,15 @@ def get_management_token() -> Optional[str]:
         # cache token (refresh 60s before expiry)
         _token_cache["access_token"] = token
         _token_cache["expires_at"] = datetime.now() + timedelta(seconds=max(0, expires_in - 60))
+        _save_cached_token(token, _token_cache["expires_at"])
         # Best-effort debug of token contents (audience), without external deps
         try:
-            import base64, json as _json
             parts = token.split(".")
             if len(parts) >= 2:
                 def _b64pad(s: str) -> str:
                     return s + "=" * ((4 - len(s) % 4) % 4)
                 payload_raw = base64.urlsafe_b64decode(_b64pad(parts[1]))
-                payload_json = _json.loads(payload_raw.decode("utf-8", errors="ignore"))
+                payload_json = json.loads(payload_raw.decode("utf-8", errors="ignore"))
                 aud = payload_json.get("aud")
                 scopes = payload_json.get("scope") or payload_json.get("permissions")
                 print(
@@ -145,44 +243,59 @@ def get_management_token() -> Optional[str]:
         except Exception:
             pass
         return token
-    except requests.RequestException as e:
+    except (requests.RequestException, ValueError) as e:
+        # ValueError: a 2xx response whose body isn't JSON (e.g. an HTML proxy page)
         print(f"Error obtaining Auth0 management token: {e}")
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return None
 
 
+def _invalidate_token() -> None:
+    """Forget the management token, in memory and on disk, so the next call fetches a new one."""
+    _token_cache["access_token"] = None
+    _token_cache["expires_at"] = None
+    try:
+        os.remove(TOKEN_CACHE_PATH)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Warning: could not remove cached Auth0 token at {TOKEN_CACHE_PATH}: {e}", file=sys.stderr)
+
+
+def _auth0_send(method: str, url: str, token: str, **kwargs) -> requests.Response:
+    """Send a Management API request. A 401 means the (possibly persisted) token was revoked
+    or rotated, so it is dropped and the request retried once with a fresh token."""
+    resp = _SESSION.request(method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+    if resp.status_code == 401:
+        _invalidate_token()
+        fresh_token = get_management_token()
+        if fresh_token:
+            resp = _SESSION.request(method, url, headers={"Authorization": f"Bearer {fresh_token}"}, **kwargs)
+    return resp
+
+
 # --- Auth0 client operations ---
-def get_client_details(client_id: Optional[str] = None) -> Optional[Dict]:
-    token = get_management_token()
-    if not token:
-        return None
+def get_client_details(client_id: Optional[str] = None, force_refresh: bool = False) -> Optional[Dict]:
     client_id = (client_id or AUTH0_APP_CLIENT_ID or "").strip()
     if not client_id:
         print("Error: No client_id provided and AUTH0_APP_CLIENT_ID not set")
         return None
+    cached = _CLIENT_CACHE.get(client_id)
+    if cached and not force_refresh and datetime.now() - cached[0] < _CLIENT_CACHE_TTL:
+        return cached[1]
+    token = get_management_token()
+    if not token:
+        return None
     try:
         url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
-        resp = requests.get(url, headers=headers, timeout=25)
+        resp = _auth0_send("GET", url, token, timeout=25)
         resp.raise_for_status()
-        return resp.json()
-    except requests.RequestException as e:
+        client = _json_loads(resp.content)
+        _CLIENT_CACHE[client_id] = (datetime.now(), client)
+        return client
+    except (requests.RequestException, ValueError) as e:
         print(f"Error getting client details: {e}")
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return None
 
 
@@ -190,6 +303,24 @@ def _ensure_list(v):
     return list(v or []) if isinstance(v, list) else ([] if v in (None, "") else [v])
 
 
+def _uniq(seq: List[str]) -> List[str]:
+    """Drop duplicates, keeping the first occurrence of each entry in order."""
+    return list(dict.fromkeys(seq))
+
+
+def _same_urls(a: List[str], b: List[str]) -> bool:
+    """Auth0 treats these lists as unordered, so a reorder alone is not a change."""
+    return sorted(a) == sorted(b)
+
+
+def _add_missing(urls: List[str], present: set, url: str, added: List[str]) -> None:
+    """Append url to urls (and added) unless present, its membership set, already has it."""
+    if url not in present:
+        present.add(url)
+        urls.append(url)
+        added.append(url)
+
+
 def update_client_urls(
     custom_domain: str,
     client_id: Optional[str] = None,
@@ -209,8 +340,8 @@ def update_client_urls(
         print(msg)
         return {"success": False, "message": msg, "domain": custom_domain, "client_id": client_id}
 
-    domains = domain_variants(custom_domain) if add_variants else [normalize_domain(custom_domain)]
-    print(f"Processing domains: {domains}")
+    domains = domain_variants(custom_domain) if add_variants else (normalize_domain(custom_domain),)
+    print(f"Processing domains: {list(domains)}")
 
     callbacks = _ensure_list(current.get("callbacks"))
     logout_urls = _ensure_list(current.get("allowed_logout_urls"))
@@ -220,28 +351,18 @@ def update_client_urls(
     added_logout_urls: List[str] = []
     added_web_origins: List[str] = []
 
-    for d in domains:
-        callback_url = f"{protocol}://{d}/callback"
-        if callback_url not in callbacks:
-            callbacks.append(callback_url)
-            added_callbacks.append(callback_url)
-        root_callback = f"{protocol}://{d}/"
-        if root_callback not in callbacks:
-            callbacks.append(root_callback)
-            added_callbacks.append(root_callback)
+    cb_set = set(callbacks)
+    lo_set = set(logout_urls)
+    wo_set = set(web_origins)
 
+    for d in domains:
         base_url = f"{protocol}://{d}"
+        _add_missing(callbacks, cb_set, f"{base_url}/callback", added_callbacks)
+        _add_missing(callbacks, cb_set, f"{base_url}/", added_callbacks)
         # Add both base domain and /login for logout URLs
-        if base_url not in logout_urls:
-            logout_urls.append(base_url)
-            added_logout_urls.append(base_url)
-        login_url = f"{base_url}/login"
-        if login_url not in logout_urls:
-            logout_urls.append(login_url)
-            added_logout_urls.append(login_url)
-        if base_url not in web_origins:
-            web_origins.append(base_url)
-            added_web_origins.append(base_url)
+        _add_missing(logout_urls, lo_set, base_url, added_logout_urls)
+        _add_missing(logout_urls, lo_set, f"{base_url}/login", added_logout_urls)
+        _add_missing(web_origins, wo_set, base_url, added_web_origins)
 
     if not (added_callbacks or added_logout_urls or added_web_origins):
         msg = f"All URLs for '{custom_domain}' already exist in Auth0 configuration"
@@ -254,6 +375,8 @@ def update_client_urls(
             "status": "no_changes",
         }
 
+    # Auth0 should never be sent duplicates, even ones that were already stored
+    callbacks, logout_urls, web_origins = _uniq(callbacks), _uniq(logout_urls), _uniq(web_origins)
     update_payload = {
         "callbacks": callbacks,
         "allowed_logout_urls": logout_urls,
@@ -268,10 +391,10 @@ def update_client_urls(
 
     try:
         url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         print(f"Updating Auth0 client {client_id}...")
-        resp = requests.patch(url, json=update_payload, headers=headers, timeout=30)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
         resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
         result = {
             "success": True,
             "message": f"Successfully added domain '{custom_domain}' to Auth0 configuration",
@@ -288,19 +411,12 @@ def update_client_urls(
                 "web_origins": len(web_origins),
             },
         }
-        print(json.dumps(result))
+        _print_json(result)
         return result
     except requests.RequestException as e:
         msg = f"Error updating Auth0 client: {e}"
         print(msg)
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return {"success": False, "message": msg, "domain": custom_domain, "client_id": client_id}
 
 
@@ -322,44 +438,24 @@ def remove_client_urls(
         print(msg)
         return {"success": False, "message": msg, "domain": custom_domain, "client_id": client_id}
 
-    domains = domain_variants(custom_domain) if remove_variants else [normalize_domain(custom_domain)]
-    print(f"Removing domains: {domains}")
+    domains = domain_variants(custom_domain) if remove_variants else (normalize_domain(custom_domain),)
+    print(f"Removing domains: {list(domains)}")
 
     callbacks = _ensure_list(current.get("callbacks"))
     logout_urls = _ensure_list(current.get("allowed_logout_urls"))
     web_origins = _ensure_list(current.get("web_origins"))
 
-    removed_callbacks: List[str] = []
-    removed_logout_urls: List[str] = []
-    removed_web_origins: List[str] = []
+    base_remove = {f"{proto}://{d}" for d in domains for proto in ("https", "http")}
+    cb_remove = {f"{base}{path}" for base in base_remove for path in ("/callback", "/", "", "/login")}
+    lo_remove = base_remove | {f"{base}/login" for base in base_remove}
 
-    for d in domains:
-        patterns = [
-            f"https://{d}/callback",
-            f"https://{d}/",
-            f"https://{d}",
-            f"https://{d}/login",
-            f"http://{d}/callback",
-            f"http://{d}/",
-            f"http://{d}",
-            f"http://{d}/login",
-        ]
-        for p in list(patterns):
-            if p in callbacks:
-                callbacks.remove(p)
-                removed_callbacks.append(p)
-        for proto in ["https", "http"]:
-            base = f"{proto}://{d}"
-            if base in logout_urls:
-                logout_urls.remove(base)
-                removed_logout_urls.append(base)
-            login_url = f"{base}/login"
-            if login_url in logout_urls:
-                logout_urls.remove(login_url)
-                removed_logout_urls.append(login_url)
-            if base in web_origins:
-                web_origins.remove(base)
-                removed_web_origins.append(base)
+    # One pass per list instead of a list.remove scan per candidate URL
+    removed_callbacks = [c for c in callbacks if c in cb_remove]
+    callbacks = [c for c in callbacks if c not in cb_remove]
+    removed_logout_urls = [u for u in logout_urls if u in lo_remove]
+    logout_urls = [u for u in logout_urls if u not in lo_remove]
+    removed_web_origins = [o for o in web_origins if o in base_remove]
+    web_origins = [o for o in web_origins if o not in base_remove]
 
     if not (removed_callbacks or removed_logout_urls or removed_web_origins):
         msg = f"No URLs for '{custom_domain}' found in Auth0 configuration"
@@ -372,6 +468,8 @@ def remove_client_urls(
             "status": "not_found",
         }
 
+    # Auth0 should never be sent duplicates, even ones that were already stored
+    callbacks, logout_urls, web_origins = _uniq(callbacks), _uniq(logout_urls), _uniq(web_origins)
     update_payload = {
         "callbacks": callbacks,
         "allowed_logout_urls": logout_urls,
@@ -386,10 +484,10 @@ def remove_client_urls(
 
     try:
         url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         print(f"Updating Auth0 client {client_id}...")
-        resp = requests.patch(url, json=update_payload, headers=headers, timeout=30)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
         resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
         result = {
             "success": True,
             "message": f"Successfully removed domain '{custom_domain}' from Auth0 configuration",
@@ -406,22 +504,197 @@ def remove_client_urls(
                 "web_origins": len(web_origins),
             },
         }
-        print(json.dumps(result))
+        _print_json(result)
         return result
     except requests.RequestException as e:
         msg = f"Error updating Auth0 client: {e}"
         print(msg)
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return {"success": False, "message": msg, "domain": custom_domain, "client_id": client_id}
 
 
+def bulk_update(
+    domains: List[str],
+    client_id: Optional[str] = None,
+    add_variants: bool = True,
+    protocol: str = "https",
+) -> Dict:
+    """Add several domains with the same rules as update_client_urls, using one read and one PATCH."""
+    client_id = (client_id or AUTH0_APP_CLIENT_ID or "").strip()
+    if not client_id:
+        msg = "Error: No client_id provided and AUTH0_APP_CLIENT_ID not set"
+        print(msg)
+        return {"success": False, "message": msg, "domains": domains}
+
+    current = get_client_details(client_id)
+    if not current:
+        msg = f"Failed to get current configuration for client {client_id}"
+        print(msg)
+        return {"success": False, "message": msg, "domains": domains, "client_id": client_id}
+
+    callbacks = _ensure_list(current.get("callbacks"))
+    logout_urls = _ensure_list(current.get("allowed_logout_urls"))
+    web_origins = _ensure_list(current.get("web_origins"))
+    cb_set = set(callbacks)
+    lo_set = set(logout_urls)
+    wo_set = set(web_origins)
+
+    added: Dict[str, Dict[str, List[str]]] = {}
+    for custom_domain in domains:
+        added_callbacks: List[str] = []
+        added_logout_urls: List[str] = []
+        added_web_origins: List[str] = []
+        variants = domain_variants(custom_domain) if add_variants else (normalize_domain(custom_domain),)
+        for d in variants:
+            base_url = f"{protocol}://{d}"
+            _add_missing(callbacks, cb_set, f"{base_url}/callback", added_callbacks)
+            _add_missing(callbacks, cb_set, f"{base_url}/", added_callbacks)
+            _add_missing(logout_urls, lo_set, base_url, added_logout_urls)
+            _add_missing(logout_urls, lo_set, f"{base_url}/login", added_logout_urls)
+            _add_missing(web_origins, wo_set, base_url, added_web_origins)
+        added[custom_domain] = {
+            "callbacks": added_callbacks,
+            "allowed_logout_urls": added_logout_urls,
+            "web_origins": added_web_origins,
+        }
+
+    if not any(any(urls.values()) for urls in added.values()):
+        msg = f"All URLs for {len(domains)} domains already exist in Auth0 configuration"
+        print(msg)
+        return {
+            "success": True,
+            "message": msg,
+            "domains": domains,
+            "client_id": client_id,
+            "status": "no_changes",
+        }
+
+    callbacks, logout_urls, web_origins = _uniq(callbacks), _uniq(logout_urls), _uniq(web_origins)
+    token = get_management_token()
+    if not token:
+        msg = "Failed to get management token for bulk update"
+        print(msg)
+        return {"success": False, "message": msg, "domains": domains, "client_id": client_id}
+
+    try:
+        url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
+        update_payload = {
+            "callbacks": callbacks,
+            "allowed_logout_urls": logout_urls,
+            "web_origins": web_origins,
+        }
+        print(f"Updating Auth0 client {client_id} with {len(domains)} domains...", file=sys.stderr)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
+        resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
+        result = {
+            "success": True,
+            "message": f"Successfully added {len(domains)} domains to Auth0 configuration",
+            "domains": domains,
+            "client_id": client_id,
+            "added": added,
+            "total": {
+                "callbacks": len(callbacks),
+                "allowed_logout_urls": len(logout_urls),
+                "web_origins": len(web_origins),
+            },
+        }
+        _print_json(result)
+        return result
+    except requests.RequestException as e:
+        msg = f"Error updating Auth0 client (bulk add): {e}"
+        print(msg)
+        _print_error(e)
+        return {"success": False, "message": msg, "domains": domains, "client_id": client_id}
+
+
+def bulk_remove(
+    domains: List[str],
+    client_id: Optional[str] = None,
+    remove_variants: bool = True,
+) -> Dict:
+    """Remove several domains with the same rules as remove_client_urls, using one read and one PATCH."""
+    client_id = (client_id or AUTH0_APP_CLIENT_ID or "").strip()
+    if not client_id:
+        msg = "Error: No client_id provided and AUTH0_APP_CLIENT_ID not set"
+        print(msg)
+        return {"success": False, "message": msg, "domains": domains}
+
+    current = get_client_details(client_id)
+    if not current:
+        msg = f"Failed to get current configuration for client {client_id}"
+        print(msg)
+        return {"success": False, "message": msg, "domains": domains, "client_id": client_id}
+
+    callbacks = _ensure_list(current.get("callbacks"))
+    logout_urls = _ensure_list(current.get("allowed_logout_urls"))
+    web_origins = _ensure_list(current.get("web_origins"))
+
+    removed: Dict[str, Dict[str, List[str]]] = {}
+    for custom_domain in domains:
+        variants = domain_variants(custom_domain) if remove_variants else (normalize_domain(custom_domain),)
+        base_remove = {f"{proto}://{d}" for d in variants for proto in ("https", "http")}
+        cb_remove = {f"{base}{path}" for base in base_remove for path in ("/callback", "/", "", "/login")}
+        lo_remove = base_remove | {f"{base}/login" for base in base_remove}
+        removed[custom_domain] = {
+            "callbacks": [c for c in callbacks if c in cb_remove],
+            "allowed_logout_urls": [u for u in logout_urls if u in lo_remove],
+            "web_origins": [o for o in web_origins if o in base_remove],
+        }
+        callbacks = [c for c in callbacks if c not in cb_remove]
+        logout_urls = [u for u in logout_urls if u not in lo_remove]
+        web_origins = [o for o in web_origins if o not in base_remove]
+
+    if not any(any(urls.values()) for urls in removed.values()):
+        msg = f"No URLs for {len(domains)} domains found in Auth0 configuration"
+        print(msg)
+        return {
+            "success": True,
+            "message": msg,
+            "domains": domains,
+            "client_id": client_id,
+            "status": "not_found",
+        }
+
+    callbacks, logout_urls, web_origins = _uniq(callbacks), _uniq(logout_urls), _uniq(web_origins)
+    token = get_management_token()
+    if not token:
+        msg = "Failed to get management token for bulk update"
+        print(msg)
+        return {"success": False, "message": msg, "domains": domains, "client_id": client_id}
+
+    try:
+        url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
+        update_payload = {
+            "callbacks": callbacks,
+            "allowed_logout_urls": logout_urls,
+            "web_origins": web_origins,
+        }
+        print(f"Updating Auth0 client {client_id} with {len(domains)} domains...", file=sys.stderr)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
+        resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
+        result = {
+            "success": True,
+            "message": f"Successfully removed {len(domains)} domains from Auth0 configuration",
+            "domains": domains,
+            "client_id": client_id,
+            "removed": removed,
+            "remaining": {
+                "callbacks": len(callbacks),
+                "allowed_logout_urls": len(logout_urls),
+                "web_origins": len(web_origins),
+            },
+        }
+        _print_json(result)
+        return result
+    except requests.RequestException as e:
+        msg = f"Error updating Auth0 client (bulk remove): {e}"
+        print(msg)
+        _print_error(e)
+        return {"success": False, "message": msg, "domains": domains, "client_id": client_id}
+
+
 def list_client_urls(client_id: Optional[str] = None) -> Dict:
     client_id = (client_id or AUTH0_APP_CLIENT_ID or "").strip()
     if not client_id:
@@ -429,7 +702,7 @@ def list_client_urls(client_id: Optional[str] = None) -> Dict:
         print(msg)
         return {"success": False, "message": msg}
 
-    current = get_client_details(client_id)
+    current = get_client_details(client_id, force_refresh=True)
     if not current:
         msg = f"Failed to get configuration for client {client_id}"
         print(msg)
@@ -443,13 +716,12 @@ def list_client_urls(client_id: Optional[str] = None) -> Dict:
         "allowed_logout_urls": _ensure_list(current.get("allowed_logout_urls")),
         "web_origins": _ensure_list(current.get("web_origins")),
     }
-    print(json.dumps(result))
+    _print_json(result)
     return result
 
 
 def derive_logout_and_origins_from_callbacks(callbacks: List[str]) -> tuple[List[str], List[str]]:
     """Extract base URLs from callbacks to populate allowed_logout_urls and web_origins."""
-    from urllib.parse import urlparse
     logout_urls = set()
     web_origins = set()
     
@@ -489,7 +761,6 @@ def add_domain_to_all_sections(
 
     # Use exactly what user provided - no variants, no manipulation
     # Debug info goes to stderr so it doesn't interfere with JSON parsing
-    import sys
     print(f"Adding to all sections for exact URL: {domain_url}", file=sys.stderr)
 
     callbacks = _ensure_list(current.get("callbacks"))
@@ -501,7 +772,6 @@ def add_domain_to_all_sections(
     added_web_origins: List[str] = []
 
     # Parse the provided URL to extract components
-    from urllib.parse import urlparse
     try:
         parsed = urlparse(domain_url)
         if not parsed.scheme or not parsed.netloc:
@@ -515,29 +785,20 @@ def add_domain_to_all_sections(
         print(msg)
         return {"success": False, "message": msg, "domain": domain_url, "client_id": client_id}
 
+    cb_set = set(callbacks)
+    lo_set = set(logout_urls)
+    wo_set = set(web_origins)
+
     # Callbacks: exact base URL + callback endpoint
-    callback_url = f"{base_url}/api/auth/callback"
-    
-    if base_url not in callbacks:
-        callbacks.append(base_url)
-        added_callbacks.append(base_url)
-    if callback_url not in callbacks:
-        callbacks.append(callback_url)
-        added_callbacks.append(callback_url)
+    _add_missing(callbacks, cb_set, base_url, added_callbacks)
+    _add_missing(callbacks, cb_set, f"{base_url}/api/auth/callback", added_callbacks)
 
     # Logout URLs: include both base URL and /login
-    if base_url not in logout_urls:
-        logout_urls.append(base_url)
-        added_logout_urls.append(base_url)
-    logout_url = f"{base_url}/login"
-    if logout_url not in logout_urls:
-        logout_urls.append(logout_url)
-        added_logout_urls.append(logout_url)
-    
+    _add_missing(logout_urls, lo_set, base_url, added_logout_urls)
+    _add_missing(logout_urls, lo_set, f"{base_url}/login", added_logout_urls)
+
     # Web Origins: exact base URL
-    if base_url not in web_origins:
-        web_origins.append(base_url)
-        added_web_origins.append(base_url)
+    _add_missing(web_origins, wo_set, base_url, added_web_origins)
 
     if not (added_callbacks or added_logout_urls or added_web_origins):
         msg = f"All URLs for '{domain_url}' already exist in Auth0 configuration"
@@ -550,6 +811,8 @@ def add_domain_to_all_sections(
             "status": "no_changes",
         }
 
+    # Auth0 should never be sent duplicates, even ones that were already stored
+    callbacks, logout_urls, web_origins = _uniq(callbacks), _uniq(logout_urls), _uniq(web_origins)
     update_payload = {
         "callbacks": callbacks,
         "allowed_logout_urls": logout_urls,
@@ -564,10 +827,10 @@ def add_domain_to_all_sections(
 
     try:
         url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         print(f"Adding exact domain '{domain_url}' to all Auth0 sections...", file=sys.stderr)
-        resp = requests.patch(url, json=update_payload, headers=headers, timeout=30)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
         resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
         
         result = {
             "success": True,
@@ -585,20 +848,13 @@ def add_domain_to_all_sections(
                 "web_origins": len(web_origins),
             },
         }
-        print(json.dumps(result))
+        _print_json(result)
         return result
         
     except requests.RequestException as e:
         msg = f"Error updating Auth0 client (add-domain): {e}"
         print(msg)
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return {"success": False, "message": msg, "domain": domain_url, "client_id": client_id}
 
 
@@ -621,19 +877,13 @@ def remove_domain_from_all_sections(
         return {"success": False, "message": msg, "domain": domain_url, "client_id": client_id}
 
     # Use exactly what user provided - no variants, no manipulation
-    import sys
     print(f"Removing from all sections for exact URL: {domain_url}", file=sys.stderr)
 
     callbacks = _ensure_list(current.get("callbacks"))
     logout_urls = _ensure_list(current.get("allowed_logout_urls"))
     web_origins = _ensure_list(current.get("web_origins"))
 
-    removed_callbacks: List[str] = []
-    removed_logout_urls: List[str] = []
-    removed_web_origins: List[str] = []
-
     # Parse the provided URL to extract components
-    from urllib.parse import urlparse
     try:
         parsed = urlparse(domain_url)
         if not parsed.scheme or not parsed.netloc:
@@ -648,28 +898,18 @@ def remove_domain_from_all_sections(
         return {"success": False, "message": msg, "domain": domain_url, "client_id": client_id}
 
     # Remove callbacks: exact base URL + callback endpoint
-    callback_url = f"{base_url}/api/auth/callback"
-    
-    if base_url in callbacks:
-        callbacks.remove(base_url)
-        removed_callbacks.append(base_url)
-    if callback_url in callbacks:
-        callbacks.remove(callback_url)
-        removed_callbacks.append(callback_url)
+    cb_remove = {base_url, f"{base_url}/api/auth/callback"}
+    removed_callbacks = [c for c in callbacks if c in cb_remove]
+    callbacks = [c for c in callbacks if c not in cb_remove]
 
     # Remove logout URLs: remove both base URL and /login
-    if base_url in logout_urls:
-        logout_urls.remove(base_url)
-        removed_logout_urls.append(base_url)
-    logout_url = f"{base_url}/login"
-    if logout_url in logout_urls:
-        logout_urls.remove(logout_url)
-        removed_logout_urls.append(logout_url)
-    
+    lo_remove = {base_url, f"{base_url}/login"}
+    removed_logout_urls = [u for u in logout_urls if u in lo_remove]
+    logout_urls = [u for u in logout_urls if u not in lo_remove]
+
     # Remove web origins: exact base URL
-    if base_url in web_origins:
-        web_origins.remove(base_url)
-        removed_web_origins.append(base_url)
+    removed_web_origins = [o for o in web_origins if o == base_url]
+    web_origins = [o for o in web_origins if o != base_url]
 
     if not (removed_callbacks or removed_logout_urls or removed_web_origins):
         msg = f"No URLs for '{domain_url}' found in Auth0 configuration"
@@ -682,6 +922,8 @@ def remove_domain_from_all_sections(
             "status": "not_found",
         }
 
+    # Auth0 should never be sent duplicates, even ones that were already stored
+    callbacks, logout_urls, web_origins = _uniq(callbacks), _uniq(logout_urls), _uniq(web_origins)
     update_payload = {
         "callbacks": callbacks,
         "allowed_logout_urls": logout_urls,
@@ -696,10 +938,10 @@ def remove_domain_from_all_sections(
 
     try:
         url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         print(f"Removing exact domain '{domain_url}' from all Auth0 sections...", file=sys.stderr)
-        resp = requests.patch(url, json=update_payload, headers=headers, timeout=30)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
         resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
         
         result = {
             "success": True,
@@ -717,20 +959,13 @@ def remove_domain_from_all_sections(
                 "web_origins": len(web_origins),
             },
         }
-        print(json.dumps(result))
+        _print_json(result)
         return result
         
     except requests.RequestException as e:
         msg = f"Error updating Auth0 client (remove-domain): {e}"
         print(msg)
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return {"success": False, "message": msg, "domain": domain_url, "client_id": client_id}
 
 
@@ -751,7 +986,7 @@ def set_web_origins(web_origins_list: List[str], client_id: Optional[str] = None
     old_origins = _ensure_list(current.get("web_origins"))
     new_origins = _uniq(web_origins_list)  # Remove duplicates while preserving order
 
-    changed = new_origins != old_origins
+    changed = not _same_urls(new_origins, old_origins)
 
     result = {
         "success": True,
@@ -766,7 +1001,7 @@ def set_web_origins(web_origins_list: List[str], client_id: Optional[str] = None
     }
 
     if not changed or not apply:
-        print(json.dumps(result))
+        _print_json(result)
         return result
 
     token = get_management_token()
@@ -777,26 +1012,19 @@ def set_web_origins(web_origins_list: List[str], client_id: Optional[str] = None
 
     try:
         url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         update_payload = {
             "web_origins": new_origins,
         }
-        resp = requests.patch(url, json=update_payload, headers=headers, timeout=30)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
         resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
         result["message"] = f"Web origins updated with {len(new_origins)} entries"
-        print(json.dumps(result))
+        _print_json(result)
         return result
     except requests.RequestException as e:
         msg = f"Error updating Auth0 client web origins: {e}"
         print(msg)
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return {"success": False, "message": msg, "client_id": client_id}
 
 
@@ -821,7 +1049,7 @@ def populate_logout_and_origins(client_id: Optional[str] = None, apply: bool = T
     # Derive new logout URLs and web origins from callbacks
     new_logout, new_origins = derive_logout_and_origins_from_callbacks(callbacks)
 
-    changed = (new_logout != old_logout) or (new_origins != old_origins)
+    changed = not (_same_urls(new_logout, old_logout) and _same_urls(new_origins, old_origins))
 
     result = {
         "success": True,
@@ -838,7 +1066,7 @@ def populate_logout_and_origins(client_id: Optional[str] = None, apply: bool = T
     }
 
     if not changed or not apply:
-        print(json.dumps(result))
+        _print_json(result)
         return result
 
     token = get_management_token()
@@ -849,34 +1077,27 @@ def populate_logout_and_origins(client_id: Optional[str] = None, apply: bool = T
 
     try:
         url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         update_payload = {
             "allowed_logout_urls": new_logout,
             "web_origins": new_origins,
         }
-        resp = requests.patch(url, json=update_payload, headers=headers, timeout=30)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
         resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
         result["message"] = "Logout URLs and web origins populated from callbacks"
-        print(json.dumps(result))
+        _print_json(result)
         return result
     except requests.RequestException as e:
         msg = f"Error updating Auth0 client (populate): {e}"
         print(msg)
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return {"success": False, "message": msg, "client_id": client_id}
 
 
 def _print_usage() -> None:
     print("Usage:")
-    print("  Add domain:     python auth0_manager.py add <domain> [client_id]")
-    print("  Remove domain:  python auth0_manager.py remove <domain> [client_id]")
+    print("  Add domain:     python auth0_manager.py add <domain[,domain...]> [client_id]")
+    print("  Remove domain:  python auth0_manager.py remove <domain[,domain...]> [client_id]")
     print("  List URLs:      python auth0_manager.py list [client_id]")
     print("  Canonicalize:   python auth0_manager.py canonicalize [client_id]")
     print("  Populate:       python auth0_manager.py populate [client_id]")
@@ -887,6 +1108,7 @@ def _print_usage() -> None:
     print("Examples:")
     print("  python auth0_manager.py add portal.example.com")
     print("  python auth0_manager.py remove portal.example.com")
+    print("  python auth0_manager.py add portal.example.com,app.example.com")
     print("  python auth0_manager.py list")
     print("  python auth0_manager.py canonicalize")
     print("  python auth0_manager.py populate")
@@ -953,18 +1175,7 @@ def _path_category(path: str) -> str:
     return "other"
 
 
-def _uniq(seq: List[str]) -> List[str]:
-    seen = set()
-    out = []
-    for s in seq:
-        if s not in seen:
-            out.append(s)
-            seen.add(s)
-    return out
-
-
 def canonicalize_callbacks(callbacks: List[str]) -> List[str]:
-    from urllib.parse import urlparse
     keep_exact: List[str] = []   # localhost and other-paths
     add_apex: List[str] = []
     want_wildcard = set()  # tuples: (scheme, base, category)
@@ -1027,7 +1238,6 @@ def canonicalize_simple_urls(urls: List[str]) -> List[str]:
     """Canonicalize logout urls or web origins: wildcard subdomains, keep apex and localhost exact.
     Any entries that include a path are kept exact (no folding).
     """
-    from urllib.parse import urlparse
     keep_exact: List[str] = []
     add_apex: List[str] = []
     want_wildcard = set()  # (scheme, base, port)
@@ -1109,7 +1319,7 @@ def canonicalize_client_urls(client_id: Optional[str] = None, apply: bool = True
     }
 
     if not changed or not apply:
-        print(json.dumps(result))
+        _print_json(result)
         return result
 
     token = get_management_token()
@@ -1120,28 +1330,21 @@ def canonicalize_client_urls(client_id: Optional[str] = None, apply: bool = True
 
     try:
         url = f"https://{AUTH0_DOMAIN}/api/v2/clients/{client_id}"
-        headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
         update_payload = {
             "callbacks": new_callbacks,
             "allowed_logout_urls": new_logout,
             "web_origins": new_origins,
         }
-        resp = requests.patch(url, json=update_payload, headers=headers, timeout=30)
+        resp = _auth0_send("PATCH", url, token, data=_json_dumps(update_payload), timeout=30)
         resp.raise_for_status()
+        _CLIENT_CACHE.pop(client_id, None)
         result["message"] = "Client URLs canonicalized and updated"
-        print(json.dumps(result))
+        _print_json(result)
         return result
     except requests.RequestException as e:
         msg = f"Error updating Auth0 client (canonicalize): {e}"
         print(msg)
-        try:
-            if e.response is not None:
-                print(json.dumps(e.response.json(), indent=2))
-        except Exception:
-            try:
-                print(e.response.text)  # type: ignore[attr-defined]
-            except Exception:
-                pass
+        _print_error(e)
         return {"success": False, "message": msg, "client_id": client_id}
 
 
@@ -1158,7 +1361,15 @@ if __name__ == "__main__":
         else:
             custom_domain = sys.argv[2].strip()
         cid = sys.argv[3].strip() if len(sys.argv) > 3 else None
-        res = update_client_urls(custom_domain, cid)
+        # Several comma-separated domains go out in a single PATCH
+        domains = [d.strip() for d in custom_domain.split(",") if d.strip()]
+        if not domains:
+            print("Error: No domain provided")
+            sys.exit(1)
+        if len(domains) > 1:
+            res = bulk_update(domains, cid)
+        else:
+            res = update_client_urls(domains[0], cid)
         sys.exit(0 if res.get("success") else 1)
 
     elif action == "remove":
@@ -1167,7 +1378,14 @@ if __name__ == "__main__":
         else:
             custom_domain = sys.argv[2].strip()
         cid = sys.argv[3].strip() if len(sys.argv) > 3 else None
-        res = remove_client_urls(custom_domain, cid)
+        domains = [d.strip() for d in custom_domain.split(",") if d.strip()]
+        if not domains:
+            print("Error: No domain provided")
+            sys.exit(1)
+        if len(domains) > 1:
+            res = bulk_remove(domains, cid)
+        else:
+            res = remove_client_urls(domains[0], cid)
         sys.exit(0 if res.get("success") else 1)
 
     elif action == "list":